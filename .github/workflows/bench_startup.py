@@ -0,0 +1,214 @@
+"""
+Cold-start guard for the pipeline stages.
+
+Imports each stage module in a fresh interpreter under `python -X importtime`,
+keeps the best of --repeat runs, and fails if a heavy dependency (NumPy,
+rapidfuzz) is loaded at import time: those are imported only once a suite is
+large enough to need them. It also fails if a stage's cumulative import time
+grows past its budget, a multiple of the time the same interpreter takes to
+import a few standard-library modules, so the check holds on slower runners
+and other Python versions.
+
+Small suites are therefore scored in pure Python (prioritize.py), which emulates
+NumPy's float32 arithmetic, including the blocking of its pairwise summation,
+an implementation detail of NumPy. The guard also scores random suites both
+ways and fails unless orders, scores and rewards match bit for bit, so a NumPy
+upgrade that changes the summation is caught.
+
+Finally it checks two invariants of committed files: setup.py writes
+byte-identical matrix JSON whatever the worker count, and compacting the
+fault history into checkpoint.json leaves every reward unchanged.
+
+    python .github/workflows/bench_startup.py [--repeat 5] [--scale 1.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Sequence
+
+# Standard-library modules every stage imports; their import time is the unit
+# the budgets are measured in.
+BASELINE_MODULES = ("json", "typing", "subprocess", "argparse")
+# Budgets in baseline units, about 2x the ratios measured locally (generate 0.7,
+# setup 1.4, prioritize 1.1, execute 1.4, compact 1.1, orchestrate 1.1).
+# With NumPy/rapidfuzz imported eagerly, setup and prioritize came to about 6
+# and 4. Runs on every change to a stage (startup.yml).
+BUDGETS = {
+    "generate": 1.5,
+    "setup": 3.0,
+    "prioritize": 2.5,
+    "execute": 3.0,
+    "compact": 2.5,
+    "orchestrate": 2.5,
+}
+HEAVY_MODULES = ("numpy", "rapidfuzz")
+# Suite sizes for the scoring check: either side of the 8-element unroll and the
+# 128-element block of NumPy's pairwise summation, and past NUMPY_MIN_CASES.
+CHECK_SIZES = (5, 25, 128, 129, 300, 1000)
+# Suite for the matrix check: several write blocks (setup.WRITE_ROWS) per matrix.
+MATRIX_CHECK_CASES = 300
+MATRIX_CHECK_WORKERS = (1, 3)
+# Synthetic fault history for the compaction check, compacted in two rounds
+# (the second resumes from the first checkpoint).
+COMPACT_CHECK_VERSIONS = 12
+COMPACT_CHECK_KEEP = (5, 2)
+
+def import_profile(modules: Sequence[str], cwd: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds per module loaded by `import <modules>`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {', '.join(modules)} failed:\n{proc.stderr}")
+    out = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            out[name.strip()] = int(cumulative)
+    return out
+
+def check_scoring_paths(sizes=CHECK_SIZES, seed: int = 0) -> List[str]:
+    """Mismatches between prioritize.py's pure-Python and NumPy paths on random suites."""
+    import random
+
+    import prioritize as P
+
+    np = P._numpy()
+    rng = random.Random(seed)
+    problems = []
+    for n in sizes:
+        ids = [f"TC{i:04d}" for i in range(n)]
+        dense = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(i + 1, n):
+                dense[i][j] = dense[j][i] = rng.choice([0.0, 0.25, 0.5, 1.0, rng.random()])
+        vmaps = [{tid: int(rng.random() < 0.3) for tid in ids} for _ in range(3)]
+        pure_reward = P.fold_rewards(ids, None, vmaps, 0.7, use_np=False)[:n]
+        np_reward = P.fold_rewards(ids, None, vmaps, 0.7, use_np=True)[:n]
+        pure_mat = [P.f32(row) for row in dense]
+        np_mat = np.array(dense, dtype=np.float32)
+        pure_order, pure_scores = P.prioritize_order(ids, pure_mat, pure_mat, pure_reward)
+        np_order, np_scores = P.prioritize_order(ids, np_mat, np_mat, np_reward)
+        if pure_reward != np_reward.tolist():
+            problems.append(f"{n} cases: rewards differ")
+        if pure_scores != np_scores.tolist():
+            problems.append(f"{n} cases: scores differ")
+        if pure_order != np_order:
+            problems.append(f"{n} cases: orders differ")
+        if P.mean(pure_reward) != P.mean(np_reward):
+            problems.append(f"{n} cases: reward means differ")
+    return problems
+
+def check_matrix_workers(n: int = MATRIX_CHECK_CASES, workers=MATRIX_CHECK_WORKERS, seed: int = 0) -> List[str]:
+    """Matrices whose JSON from setup.build_matrices differs between worker counts."""
+    import random
+    import tempfile
+
+    import setup
+    from metrics import prepare_field
+
+    rng = random.Random(seed)
+    ids = [f"TC{i:04d}" for i in range(n)]
+    strings = {tid: [str(rng.randint(0, 10 ** rng.randint(1, 8))) for _ in range(rng.randint(0, 2))] for tid in ids}
+    numbers = {tid: [rng.uniform(-1e3, 1e3)] for tid in ids}
+    fields = {"input": prepare_field("levenshtein", ids, strings), "output": prepare_field("absdiff", ids, numbers)}
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        written = {}
+        for w in workers:
+            paths = {key: os.path.join(tmp, f"{key}-{w}.json") for key in fields}
+            setup.build_matrices(ids, fields, paths, workers=w)
+            for key, path in paths.items():
+                with open(path, "rb") as f:
+                    written.setdefault(key, {})[w] = f.read()
+        for key, by_workers in written.items():
+            if len(set(by_workers.values())) > 1:
+                problems.append(f"{key} matrix differs between {', '.join(map(str, workers))} workers")
+    return problems
+
+def check_compaction(seed: int = 0, decay: float = 0.7) -> List[str]:
+    """Rewards that change when a synthetic fault history is compacted."""
+    import json
+    import random
+    import tempfile
+
+    import prioritize as P
+
+    rng = random.Random(seed)
+    # Cases join and leave the suite between versions; "TC9999" never appears.
+    ids = [f"TC{i:04d}" for i in range(40)] + ["TC9999"]
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for v in range(1, COMPACT_CHECK_VERSIONS + 1):
+            present = ids[v:v + 30]
+            with open(os.path.join(tmp, f"V{v}.json"), "w") as f:
+                json.dump({tid: int(rng.random() < 0.3) for tid in present}, f)
+        expected = {use_np: P.get_reward_from_history(tmp, ids, decay, use_np) for use_np in (False, True)}
+        for keep in COMPACT_CHECK_KEEP:
+            P.compact_fault_history(tmp, keep=keep, decay=decay)
+            for use_np, before in expected.items():
+                after = P.get_reward_from_history(tmp, ids, decay, use_np)
+                if list(after) != list(before):
+                    path = "NumPy" if use_np else "pure-Python"
+                    problems.append(f"{path} rewards changed after compacting to {keep} versions")
+    return problems
+
+def best_ms(modules: Sequence[str], cwd: str, repeat: int) -> float:
+    """Fastest of repeat cold imports of modules, in milliseconds."""
+    return min(sum(run[m] for m in modules) for run in (import_profile(modules, cwd) for _ in range(repeat))) / 1000.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Check stage import times against their budgets.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage; the fastest counts")
+    parser.add_argument("--scale", type=float, default=float(os.environ.get("STARTUP_BUDGET_SCALE", "1.0")),
+                        help="multiply every budget")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    repeat = max(1, args.repeat)
+    baseline = best_ms(BASELINE_MODULES, here, repeat)
+    print(f"baseline: import {', '.join(BASELINE_MODULES)} in {baseline:.1f}ms")
+    failed = False
+    print(f"{'stage':<12} {'best':>8} {'ratio':>6} {'budget':>6}  status")
+    for stage, budget in BUDGETS.items():
+        runs = [import_profile([stage], here) for _ in range(repeat)]
+        best = min(run[stage] for run in runs) / 1000.0
+        ratio = best / baseline
+        limit = budget * args.scale
+        heavy = sorted({name for name in runs[0] if name.split(".")[0] in HEAVY_MODULES and "." not in name})
+        status = "ok"
+        if heavy:
+            status = f"FAIL: imports {', '.join(heavy)} at load time"
+        elif ratio > limit:
+            status = "FAIL: over budget"
+        failed = failed or status != "ok"
+        print(f"{stage:<12} {best:>6.1f}ms {ratio:>5.2f}x {limit:>5.2f}x  {status}")
+
+    problems = check_scoring_paths()
+    for problem in problems:
+        print(f"FAIL: pure-Python and NumPy scoring differ: {problem}")
+    if not problems:
+        print(f"scoring paths identical on {len(CHECK_SIZES)} random suites")
+
+    matrix_problems = check_matrix_workers()
+    for problem in matrix_problems:
+        print(f"FAIL: setup output depends on SETUP_WORKERS: {problem}")
+    if not matrix_problems:
+        print(f"matrix JSON identical with {', '.join(map(str, MATRIX_CHECK_WORKERS))} workers")
+
+    compact_problems = check_compaction()
+    for problem in compact_problems:
+        print(f"FAIL: compaction changes rewards: {problem}")
+    if not compact_problems:
+        print(f"rewards unchanged by compacting {COMPACT_CHECK_VERSIONS} versions")
+    sys.exit(1 if failed or problems or matrix_problems or compact_problems else 0)
+
+if __name__ == "__main__":
+    main()
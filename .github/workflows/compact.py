@@ -0,0 +1,24 @@
+import os
+
+from prioritize import compact_fault_history
+
+def main():
+    fault_dir = "test/fault-matrices"
+    # Raw versions kept as-is; older ones are folded into checkpoint.json.
+    # At decay 0.7 a version 30 cycles old weighs 0.7**30 ~ 2e-5 in the reward.
+    keep = int(os.environ.get("FAULT_HISTORY_WINDOW", "30"))
+    decay = float(os.environ.get("REWARD_DECAY", "0.7"))
+
+    try:
+        folded = compact_fault_history(fault_dir, keep=keep, decay=decay)
+    except ValueError as e:
+        # Leave the history untouched until the checkpoint is repaired or removed.
+        print(f"WARNING: {e}")
+        return
+    if folded:
+        print(f"Compacted {folded} fault matrix version(s) into {fault_dir}/checkpoint.json (window={keep}).")
+    else:
+        print(f"Fault history within window ({keep}); nothing to compact.")
+
+if __name__ == "__main__":
+    main()
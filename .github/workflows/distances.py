@@ -0,0 +1,193 @@
+"""
+On-demand pair distances over the test suite, without building a matrix.
+
+Pairs are served from the sparse kNN store (input-knn.json / output-knn.json,
+see knn.py) when it lists them, and otherwise computed lazily with the same
+metric as setup.py and kept in a size-bounded, thread-safe LRU cache. Dense
+input.json / output.json are never loaded: reading one is the cost this
+module exists to avoid.
+
+CLI (options may go before or after the subcommand):
+    python .github/workflows/distances.py nearest TC05 [-k 5] [--field input] [--exact]
+    python .github/workflows/distances.py pair TC01 TC02 [--field output] [--stats]
+"""
+import argparse
+import heapq
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from knn import KnnGraph, knn_path
+from metrics import prepare_field, resolve_metric
+
+DEFAULT_CACHE_SIZE = 65536
+
+class PairCache:
+    """Bounded LRU map of unordered pair -> distance, safe to share between threads."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[int, int], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[int, int]) -> Optional[float]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple[int, int], value: float):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+class DistanceQuery:
+    """
+    Distance lookups for one field ("input" or "output") of the suite.
+    Values are preconverted once (O(N)); no pair is computed until asked for.
+    """
+
+    def __init__(self, test_cases: Dict[str, Dict[str, Any]], field: str = "input", metric: Optional[str] = None,
+                 store_path: Optional[str] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.ids = list(test_cases.keys())
+        self.index = {tid: i for i, tid in enumerate(self.ids)}
+        if field == "output":
+            # Same selection as setup.py: only cases with a usable output.
+            values = {tid: c["output"] for tid, c in test_cases.items() if c.get("output") not in ("", None)}
+        else:
+            values = {tid: c.get(field, "") for tid, c in test_cases.items()}
+        self.field = prepare_field(metric or resolve_metric(field), self.ids, values)
+        self.cache = PairCache(cache_size)
+        self.store_hits = 0
+        self.store = None
+        self._store_rows: Dict[int, Dict[int, float]] = {}
+        if store_path and os.path.isfile(store_path):
+            graph = KnnGraph.load(store_path)
+            # A store built for another suite or metric would give wrong answers.
+            if graph.ids == self.ids and graph.metric == self.field.metric:
+                self.store = graph
+
+    def _index(self, tcid: str) -> int:
+        if tcid not in self.index:
+            raise KeyError(f"Unknown test case: {tcid}")
+        return self.index[tcid]
+
+    def _from_store(self, i: int, j: int) -> Optional[float]:
+        if self.store is None:
+            return None
+        for a, b in ((i, j), (j, i)):
+            row = self._store_rows.get(a)
+            if row is None:
+                row = dict(self.store.neighbours(a))
+                self._store_rows[a] = row
+            if b in row:
+                return row[b]
+        return None
+
+    def distance(self, tcid1: str, tcid2: str) -> float:
+        i, j = self._index(tcid1), self._index(tcid2)
+        if i == j:
+            return 0.0
+        key = (i, j) if i < j else (j, i)
+        d = self._from_store(*key)
+        if d is not None:
+            self.store_hits += 1
+            return d
+        d = self.cache.get(key)
+        if d is None:
+            d = float(self.field.pair(*key))
+            self.cache.put(key, d)
+        return d
+
+    def store_answers_nearest(self, k: int) -> bool:
+        """True if nearest(k) is served from the kNN store, i.e. is approximate."""
+        return self.store is not None and k <= self.store.k
+
+    def nearest(self, tcid: str, k: int = 5, exact: bool = False) -> List[Tuple[str, float]]:
+        """
+        The k cases closest to tcid, ties broken by suite order. Unless exact,
+        these come from the kNN store when it holds at least k neighbours: an
+        approximation, since the store only saw blocked candidates and landmarks
+        (see store_answers_nearest). Otherwise one O(N) row is computed (and its
+        k results cached); the matrix is never built.
+        """
+        i = self._index(tcid)
+        if not exact and self.store_answers_nearest(k):
+            self.store_hits += 1
+            best = sorted((d, j) for j, d in self.store.neighbours(i))[:k]
+        else:
+            dists = self.field.distances_from(i)
+            best = heapq.nsmallest(k, ((float(d), j) for j, d in enumerate(dists) if j != i))
+            for d, j in best:
+                self.cache.put((i, j) if i < j else (j, i), d)
+        return [(self.ids[j], d) for d, j in best]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "store_hits": self.store_hits,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_size": len(self.cache),
+        }
+
+def add_common_options(parser: argparse.ArgumentParser, suppress: bool = False):
+    """Options accepted both before and after the subcommand."""
+    # On subcommands the defaults are suppressed so they never override a value given before it.
+    default = (lambda value: argparse.SUPPRESS) if suppress else (lambda value: value)
+    parser.add_argument("--cases", default=default(os.path.join("test", "test-cases.json")))
+    parser.add_argument("--field", default=default("input"), choices=["input", "output"])
+    parser.add_argument("--metric", default=default(None), help="defaults to SETUP_<FIELD>_METRIC, as in setup.py")
+    parser.add_argument("--cache-size", type=int, default=default(int(os.environ.get("DISTANCE_CACHE_SIZE", DEFAULT_CACHE_SIZE))))
+    parser.add_argument("--stats", action="store_true", default=default(False), help="print cache/store counters")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Query test-case distances without building the matrix.")
+    add_common_options(parser)
+    common = argparse.ArgumentParser(add_help=False)
+    add_common_options(common, suppress=True)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_nearest = sub.add_parser("nearest", parents=[common], help="nearest K cases to a TCID")
+    p_nearest.add_argument("tcid")
+    p_nearest.add_argument("-k", type=int, default=5)
+    p_nearest.add_argument("--exact", action="store_true", help="compute the row instead of using the approximate kNN store")
+    p_pair = sub.add_parser("pair", parents=[common], help="distance between two TCIDs")
+    p_pair.add_argument("tcid1")
+    p_pair.add_argument("tcid2")
+    args = parser.parse_args(argv)
+
+    with open(args.cases, "r") as f:
+        test_cases = json.load(f)
+    store_path = knn_path(os.path.join("test", "string-distances", f"{args.field}.json"))
+    try:
+        query = DistanceQuery(test_cases, args.field, args.metric, store_path, args.cache_size)
+        if args.command == "nearest":
+            if not args.exact and query.store_answers_nearest(args.k):
+                print(f"# approximate: from {store_path} (use --exact for exact neighbours)")
+            for tcid, d in query.nearest(args.tcid, args.k, args.exact):
+                print(f"{tcid}\t{d:.4f}")
+        else:
+            print(f"{query.distance(args.tcid1, args.tcid2):.4f}")
+    except (KeyError, ValueError) as e:
+        print(f"ERROR: {e.args[0] if e.args else e}")
+        raise SystemExit(1)
+    if args.stats:
+        print(json.dumps(query.stats()))
+
+if __name__ == "__main__":
+    main()
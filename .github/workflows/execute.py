@@ -1,9 +1,13 @@
 import os
+import gzip
 import json
 import subprocess
 import sys
+import time
+from array import array
+from bisect import bisect_left
 from datetime import datetime
-from typing import Dict, Tuple, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 # Performance optimization: pre-load data once
 _TCP_ORDER = None
@@ -16,13 +20,94 @@ def load_tcp_order():
             _TCP_ORDER = json.load(f)
     return _TCP_ORDER
 
+class TestCase:
+    """One entry of test-cases.json; __slots__ records take a fraction of a dict's memory."""
+
+    __slots__ = ("script", "input", "output")
+
+    def __init__(self, script: Optional[str], input, output):
+        self.script = script
+        self.input = input
+        self.output = output
+
+def _test_case_hook(obj):
+    # Called for every JSON object as it is parsed, so per-case dicts never pile up.
+    if "input" in obj and "output" in obj:
+        script = obj.get("script")
+        # Many cases share a script; interning keeps one copy of each name.
+        return TestCase(sys.intern(script) if isinstance(script, str) and script else None, obj["input"], obj["output"])
+    return obj
+
 def load_test_cases():
     global _TEST_CASES
     if _TEST_CASES is None:
         with open("test/test-cases.json") as f:
-            _TEST_CASES = json.load(f)
+            _TEST_CASES = json.load(f, object_hook=_test_case_hook)
     return _TEST_CASES
 
+def as_test_cases(cases: Dict[str, Dict]) -> Dict[str, TestCase]:
+    """Already-parsed test-cases.json content as TestCase records."""
+    return {tcid: _test_case_hook(case) for tcid, case in cases.items()}
+
+class ExecutionLog:
+    """
+    Results of a run as parallel arrays in execution order: TCID index, status
+    (1 = failed), duration in seconds and completion time in epoch seconds.
+    About 25 bytes per executed case, plus one status byte per known TCID for
+    lookups by id (get), which also makes the log usable as the results map.
+    TCIDs are found by bisecting the sorted suite ids, so no per-case dict is kept.
+    """
+
+    def __init__(self, sorted_tcids: List[str]):
+        self.tcids = list(sorted_tcids)
+        self.known = len(self.tcids)
+        # TCIDs run but not in the suite (listed in tcp.json only).
+        self.extra: Dict[str, int] = {}
+        self.index = array("q")
+        self.status = array("b")
+        self.duration = array("d")
+        self.timestamp = array("d")
+        self.by_id = array("b", bytes(self.known))
+        self.failures = 0
+
+    def position(self, tcid: str) -> Optional[int]:
+        i = bisect_left(self.tcids, tcid, 0, self.known)
+        if i < self.known and self.tcids[i] == tcid:
+            return i
+        return self.extra.get(tcid)
+
+    def record(self, tcid: str, failed: bool, duration: float, timestamp: float):
+        i = self.position(tcid)
+        if i is None:
+            i = len(self.tcids)
+            self.tcids.append(tcid)
+            self.extra[tcid] = i
+            self.by_id.append(0)
+        self.index.append(i)
+        self.status.append(1 if failed else 0)
+        self.duration.append(duration)
+        self.timestamp.append(timestamp)
+        self.by_id[i] = 1 if failed else 0
+        self.failures += 1 if failed else 0
+
+    def get(self, tcid: str, default: int = 0) -> int:
+        i = self.position(tcid)
+        return default if i is None else self.by_id[i]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[str]:
+        """TCIDs in execution order."""
+        return (self.tcids[i] for i in self.index)
+
+    def save(self, path: str):
+        """Full log as gzipped TSV: position, TCID, status, duration, timestamp."""
+        with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write("position\ttcid\tstatus\tduration\ttimestamp\n")
+            for pos, i in enumerate(self.index):
+                f.write(f"{pos + 1}\t{self.tcids[i]}\t{self.status[pos]}\t{self.duration[pos]:.6f}\t{self.timestamp[pos]:.3f}\n")
+
 def run_test_script(script_name, input1, input2, expected):
     """Optimized test execution with minimal overhead."""
     script_path = os.path.join("test", "test-scripts", script_name)
@@ -122,7 +207,7 @@ def report_failure(tcid, script_file, input1, input2, expected, stdout, stderr,
     else:
         print(body)
 
-def calculate_apfd(tcp_order: List[str], fault_results: Dict[str, int]) -> Tuple[float, Dict[str, any]]:
+def calculate_apfd(tcp_order: Iterable[str], fault_results) -> Tuple[float, Dict[str, any]]:
     """
     Calculate APFD (Average Percentage of Faults Detected) for the given TCP order.
     
@@ -133,14 +218,26 @@ def calculate_apfd(tcp_order: List[str], fault_results: Dict[str, int]) -> Tuple
     - m = total number of faults detected
     - TF_i = position of first test that detects fault i (1-indexed)
     
+    tcp_order is read once, so it may be an ExecutionLog or any iterable;
+    fault_results only needs .get(tcid, 0).
+    
     Returns:
         (apfd_score, metadata_dict)
     """
-    n = len(tcp_order)
+    # Calculate sum of fault detection positions (single pass)
+    n = 0
+    tf_sum = 0
+    first_fault_pos = None
+    fault_positions = []
     
-    # Identify faults (failed tests) in execution order
-    faults = [tcid for tcid in tcp_order if fault_results.get(tcid, 0) == 1]
-    m = len(faults)
+    for i, tcid in enumerate(tcp_order, start=1):
+        n = i
+        if fault_results.get(tcid, 0) == 1:
+            tf_sum += i
+            fault_positions.append(i)
+            if first_fault_pos is None:
+                first_fault_pos = i
+    m = len(fault_positions)
     
     if m == 0:
         # No faults detected - perfect (or no failures to prioritize)
@@ -153,18 +250,6 @@ def calculate_apfd(tcp_order: List[str], fault_results: Dict[str, int]) -> Tuple
             "random_baseline": 0.5 + (1.0 / (2 * n)) if n > 0 else 0.5
         }
     
-    # Calculate sum of fault detection positions
-    tf_sum = 0
-    first_fault_pos = None
-    fault_positions = []
-    
-    for i, tcid in enumerate(tcp_order, start=1):
-        if fault_results.get(tcid, 0) == 1:
-            tf_sum += i
-            fault_positions.append(i)
-            if first_fault_pos is None:
-                first_fault_pos = i
-    
     # Calculate APFD
     apfd = 1.0 - (tf_sum / (n * m)) + (1.0 / (2 * n))
     
@@ -190,14 +275,16 @@ def calculate_apfd(tcp_order: List[str], fault_results: Dict[str, int]) -> Tuple
     
     return apfd, metadata
 
-def build_execution_report(execution_log: List[Dict], start_time, end_time, tcp_order: List[str], fault_results: Dict[str, int]):
-    """Build comprehensive execution report table with APFD metrics."""
+def write_execution_report(f, log: ExecutionLog, test_cases, start_time, end_time, apfd_score: float, apfd_meta: Dict,
+                           max_rows: Optional[int] = None):
+    """
+    Stream the execution report table with APFD metrics to the file object f.
+    With max_rows, the table holds only the first max_rows results plus up to
+    max_rows failures after them; summary and APFD always cover the whole run.
+    """
     total_duration = calculate_elapsed(start_time, end_time)
     
-    # Calculate APFD
-    apfd_score, apfd_meta = calculate_apfd(tcp_order, fault_results)
-    
-    report = [
+    f.write("\n".join([
         "## Test Execution Report",
         f"**Started**: {format_timestamp(start_time)} UTC",
         f"**Completed**: {format_timestamp(end_time)} UTC",
@@ -206,33 +293,45 @@ def build_execution_report(execution_log: List[Dict], start_time, end_time, tcp_
         "### Execution Results (in order)",
         "",
         "| # | TCID | Status | Duration | Timestamp | Details |",
-        "|---|------|--------|----------|-----------|---------|"
-    ]
-    
-    for idx, log in enumerate(execution_log, 1):
-        status_icon = "✅" if log['passed'] else "❌"
-        tcid = log['tcid']
-        duration = f"{log['duration']:.3f}s"
-        timestamp = format_timestamp(log['timestamp'])
-        details = log.get('script', 'N/A')
+        "|---|------|--------|----------|-----------|---------|",
+        ""
+    ]))
+    
+    shown_failures = 0
+    for pos, i in enumerate(log.index):
+        failed = log.status[pos] == 1
+        if max_rows is not None and pos >= max_rows:
+            if not failed or shown_failures >= max_rows:
+                continue
+            shown_failures += 1
+        status_icon = "❌" if failed else "✅"
+        tcid = log.tcids[i]
+        duration = f"{log.duration[pos]:.3f}s"
+        timestamp = format_timestamp(datetime.utcfromtimestamp(log.timestamp[pos]))
+        case = test_cases.get(tcid)
+        details = (case.script if case else None) or 'N/A'
         
-        report.append(f"| {idx} | {tcid} | {status_icon} | {duration} | {timestamp} | {details} |")
+        f.write(f"| {pos + 1} | {tcid} | {status_icon} | {duration} | {timestamp} | {details} |\n")
+    
+    if max_rows is not None and len(log) > max_rows:
+        f.write(f"\n_Showing the first {max_rows} of {len(log)} results and {shown_failures} later failures; "
+                f"the full report and log are in the `execution-log` artifact._\n")
     
     # Summary statistics
-    passed_count = sum(1 for log in execution_log if log['passed'])
-    failed_count = len(execution_log) - passed_count
-    success_rate = (passed_count / len(execution_log) * 100) if execution_log else 0
+    failed_count = log.failures
+    passed_count = len(log) - failed_count
+    success_rate = (passed_count / len(log) * 100) if len(log) else 0
     
-    report.extend([
+    report = [
         "",
         "### Summary",
         "",
-        f"- **Total Tests**: {len(execution_log)}",
+        f"- **Total Tests**: {len(log)}",
         f"- **Passed**: {passed_count} ✅",
         f"- **Failed**: {failed_count} ❌",
         f"- **Success Rate**: {success_rate:.1f}%",
         ""
-    ])
+    ]
     
     # APFD Metrics Section
     report.extend([
@@ -282,129 +381,137 @@ def build_execution_report(execution_log: List[Dict], start_time, end_time, tcp_
     
     report.append("")
     
-    return "\n".join(report)
+    f.write("\n".join(report))
+
 
-def main():
+def write_fault_matrix(path: str, tcids: List[str], fault_results):
+    """Same bytes as json.dump({tcid: result}, indent=2), written one entry at a time."""
+    with open(path, "w") as f:
+        if not tcids:
+            f.write("{}")
+            return
+        f.write("{\n")
+        sep = ""
+        for tcid in tcids:
+            f.write(f"{sep}  {json.dumps(tcid)}: {fault_results.get(tcid, 0)}")
+            sep = ",\n"
+        f.write("\n}")
+
+# Result rows shown in the step summary besides the failures; the full report is an artifact.
+SUMMARY_ROWS = 100
+
+def main(tcp_order: Optional[List[str]] = None, test_cases: Optional[Dict[str, Dict]] = None):
+    """
+    Runs the suite in tcp.json order. In-process callers (orchestrate.py) may
+    pass the order and the parsed test cases instead of having them re-read.
+    """
     start_time = datetime.utcnow()
     print(f"🚀 Test execution started at: {format_timestamp(start_time)} UTC")
     
     # Pre-load data once
-    tcp_order = load_tcp_order()
-    test_cases = load_test_cases()
+    tcp_order = load_tcp_order() if tcp_order is None else tcp_order
+    test_cases = load_test_cases() if test_cases is None else as_test_cases(test_cases)
     canonical_order = sorted(test_cases.keys())
     
-    # Execution tracking
-    results = {}
-    execution_log = []
-    all_passed = True
-    failure_count = 0
+    # Execution tracking (also serves as the TCID -> result map)
+    log = ExecutionLog(canonical_order)
+
+    # Online mode: the next case is chosen after each result (see prioritize.OnlineScheduler)
+    if os.environ.get("TCP_ONLINE", "").strip().lower() in ("1", "true", "yes"):
+        from prioritize import online_scheduler
+        print("🔁 Online prioritization: choosing each next case from the results so far")
+        run_order = online_scheduler(test_cases).iterate(log)
+    else:
+        run_order = tcp_order
 
     # Execute tests in order (sequential for deterministic timing)
-    for tcid in tcp_order:
+    for tcid in run_order:
         case = test_cases.get(tcid)
         if not case:
-            failure_time = datetime.utcnow()
             print(f"❌ Test case {tcid} not found in test-cases.json")
-            results[tcid] = 1
-            execution_log.append({
-                'tcid': tcid,
-                'passed': False,
-                'duration': 0.0,
-                'timestamp': failure_time,
-                'script': 'N/A'
-            })
-            all_passed = False
-            failure_count += 1
+            log.record(tcid, True, 0.0, time.time())
             continue
             
-        script_file = case.get("script")
+        script_file = case.script
         if not script_file:
-            failure_time = datetime.utcnow()
             print(f"❌ No script defined for {tcid}")
-            results[tcid] = 1
-            execution_log.append({
-                'tcid': tcid,
-                'passed': False,
-                'duration': 0.0,
-                'timestamp': failure_time,
-                'script': 'N/A'
-            })
-            all_passed = False
-            failure_count += 1
+            log.record(tcid, True, 0.0, time.time())
             continue
             
-        input1, input2 = case["input"]
-        expected = case["output"]
+        input1, input2 = case.input
+        expected = case.output
         
         # Execute test with timing
-        test_start = datetime.utcnow()
+        test_start = time.perf_counter()
         rc, out, err = run_test_script(script_file, input1, input2, expected)
-        test_end = datetime.utcnow()
-        test_duration = (test_end - test_start).total_seconds()
+        test_duration = time.perf_counter() - test_start
+        test_end = time.time()
         
-        results[tcid] = rc
         passed = (rc == 0)
         
         # Log execution
-        execution_log.append({
-            'tcid': tcid,
-            'passed': passed,
-            'duration': test_duration,
-            'timestamp': test_end,
-            'script': script_file
-        })
+        log.record(tcid, not passed, test_duration, test_end)
         
         if not passed:
-            all_passed = False
-            failure_count += 1
             # Real-time failure reporting (async, non-blocking)
-            report_failure(tcid, script_file, input1, input2, expected, out, err, start_time, test_end)
+            report_failure(tcid, script_file, input1, input2, expected, out, err, start_time, datetime.utcfromtimestamp(test_end))
             print(f"❌ {tcid} failed after {test_duration:.3f}s")
         else:
             print(f"✅ {tcid} passed in {test_duration:.3f}s")
 
-    # Reorder results by canonical test-cases.json order
-    ordered_results = {tcid: results.get(tcid, 0) for tcid in canonical_order}
+    all_passed = log.failures == 0
 
-    # Write fault matrix (single I/O operation)
+    # Write fault matrix
     fault_dir = "test/fault-matrices"
     os.makedirs(fault_dir, exist_ok=True)
     
-    # Optimized version detection
+    # Optimized version detection (versions folded into checkpoint.json by compact.py count too)
     existing = [int(f[1:-5]) for f in os.listdir(fault_dir) 
                 if f.startswith("V") and f.endswith(".json") and f[1:-5].isdigit()]
+    from prioritize import load_checkpoint
+    checkpoint = load_checkpoint(fault_dir)
+    if checkpoint:
+        existing.append(int(checkpoint.get("version", 0)))
     next_num = 1 + max(existing, default=0)
     
     out_path = os.path.join(fault_dir, f"V{next_num}.json")
     
-    # Write fault matrix
-    with open(out_path, "w") as f:
-        json.dump(ordered_results, f, indent=2)
+    # Results in canonical test-cases.json order
+    write_fault_matrix(out_path, canonical_order, log)
     
     # End timing
     end_time = datetime.utcnow()
     total_duration = calculate_elapsed(start_time, end_time)
     
-    # Calculate APFD for console output
-    apfd_score, apfd_meta = calculate_apfd(tcp_order, results)
+    # Calculate APFD over the order actually run
+    apfd_score, apfd_meta = calculate_apfd(log, log)
     
     # Console summary
     print(f"\n📊 Test execution completed at: {format_timestamp(end_time)} UTC")
     print(f"⏱️  Total duration: {total_duration}")
-    print(f"✅ Passed: {len(tcp_order) - failure_count}/{len(tcp_order)}")
-    print(f"❌ Failed: {failure_count}/{len(tcp_order)}")
+    print(f"✅ Passed: {len(log) - log.failures}/{len(log)}")
+    print(f"❌ Failed: {log.failures}/{len(log)}")
     print(f"📈 APFD Score: {apfd_score:.4f} ({apfd_score * 100:.2f}%)")
     print(f"💾 Results saved to {out_path}")
     
-    # Build comprehensive step summary report with APFD
-    report = build_execution_report(execution_log, start_time, end_time, tcp_order, results)
+    # Full report and compact log, uploaded as the execution-log artifact
+    artifact_dir = os.environ.get("EXEC_ARTIFACT_DIR", os.path.join("test", "execution-log"))
+    try:
+        os.makedirs(artifact_dir, exist_ok=True)
+        with open(os.path.join(artifact_dir, "report.md"), "w") as f:
+            write_execution_report(f, log, test_cases, start_time, end_time, apfd_score, apfd_meta)
+        log.save(os.path.join(artifact_dir, "log.tsv.gz"))
+        print(f"🗂️  Full report and log saved to {artifact_dir}")
+    except Exception as e:
+        print(f"Warning: Failed to write execution log artifact: {e}")
     
-    # Write to step summary (single write)
+    # Step summary: first rows plus failures, streamed
     summary_file = os.environ.get("GITHUB_STEP_SUMMARY")
     if summary_file:
         try:
+            max_rows = int(os.environ.get("EXEC_SUMMARY_ROWS", SUMMARY_ROWS))
             with open(summary_file, "w") as f:
-                f.write(report)
+                write_execution_report(f, log, test_cases, start_time, end_time, apfd_score, apfd_meta, max_rows)
         except Exception as e:
             print(f"Warning: Failed to write step summary: {e}")
 
@@ -415,5 +522,7 @@ def main():
             f.write(f"all_passed={'true' if all_passed else 'false'}\n")
             f.write(f"apfd_score={apfd_score:.4f}\n")
 
+    return all_passed, apfd_score
+
 if __name__ == "__main__":
     main()
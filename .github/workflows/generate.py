@@ -94,6 +94,7 @@ def main():
     with open(cases_path, "w") as f:
         json.dump(test_cases, f, indent=2)
     print(f"Generated {NUM_TESTS} test cases with PASS_PROB={PROB_DIST}.")
+    return test_cases
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,235 @@
+"""
+Sparse k-nearest-neighbour similarity for suites too large for a dense matrix.
+
+Instead of all N*(N-1)/2 pairs, each case is compared only against
+  - candidates that sort next to it on the field's blocking keys (operand
+    length + prefix and length + suffix for strings, operand value for
+    numeric metrics; see metrics.py), and
+  - a fixed set of seeded random landmark cases.
+The k closest candidates are kept per case in a CSR structure, and the
+landmarks give an unbiased estimate of the case's distance to everything else,
+so an estimated average distance can stand in for the dense row average.
+Work and storage are O(N * (window + samples)), i.e. linear in N.
+
+CLI (measures the approximation against the exact matrix on a small suite):
+    python .github/workflows/knn.py evaluate [--field input] [--metric levenshtein] [--k 10] [--window 8] [--samples 64]
+"""
+import heapq
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from metrics import METRICS, prepare_field
+
+DEFAULT_K = 10
+DEFAULT_WINDOW = 8
+DEFAULT_SAMPLES = 64
+SEED = 0
+
+class KnnGraph:
+    """k nearest neighbours per case, stored as CSR (indptr, indices, data) over ids."""
+
+    def __init__(self, ids: List[str], k: int, indptr: List[int], indices: List[int], data: List[float], far: List[float],
+                 metric: str = "levenshtein"):
+        self.ids = ids
+        self.k = k
+        self.metric = metric
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        # Per-row mean distance to the landmarks; estimates distance to non-neighbours.
+        self.far = far
+
+    def neighbours(self, i: int) -> List[Tuple[int, float]]:
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return list(zip(self.indices[start:end], self.data[start:end]))
+
+    def estimated_row_mean(self) -> List[float]:
+        """
+        Estimated average distance from each case to all others: exact for the
+        stored neighbours, and the sampled far distance (never below the k-th
+        neighbour distance) for the remaining n-1-k cases.
+        """
+        n = len(self.ids)
+        denom = max(n - 1, 1)
+        out = []
+        for i in range(n):
+            row = self.data[self.indptr[i]:self.indptr[i + 1]]
+            fill = max(self.far[i], row[-1]) if row else self.far[i]
+            out.append((sum(row) + (n - 1 - len(row)) * fill) / denom)
+        return out
+
+    def to_json(self) -> Dict:
+        return {
+            "format": "csr",
+            "k": self.k,
+            "metric": self.metric,
+            "ids": self.ids,
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "data": self.data,
+            "far": self.far,
+        }
+
+    @classmethod
+    def from_json(cls, obj: Dict) -> "KnnGraph":
+        if obj.get("format") != "csr":
+            raise ValueError(f"Unsupported kNN store format: {obj.get('format')!r}")
+        return cls(obj["ids"], obj["k"], obj["indptr"], obj["indices"], obj["data"], obj["far"],
+                   obj.get("metric", "levenshtein"))
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "KnnGraph":
+        with open(path, "r") as f:
+            return cls.from_json(json.load(f))
+
+def candidate_pairs(field, window: int) -> set:
+    """Sorted-neighbourhood blocking: pair each key with the next `window` keys in sort order."""
+    entries = sorted((key, i) for i in range(len(field)) for key in field.blocking_keys(i))
+    pairs = set()
+    for p, (_, i) in enumerate(entries):
+        for q in range(p + 1, min(p + 1 + window, len(entries))):
+            j = entries[q][1]
+            if i != j:
+                pairs.add((i, j) if i < j else (j, i))
+    return pairs
+
+def build_knn(ids: List[str], field, k: int = DEFAULT_K, window: int = DEFAULT_WINDOW,
+              samples: int = DEFAULT_SAMPLES, seed: int = SEED) -> KnnGraph:
+    """
+    Build a KnnGraph for a prepared field (metrics.prepare_field) aligned to ids.
+    Ties on distance are broken by index, so the result is deterministic.
+    """
+    n = len(ids)
+    candidates: List[List[Tuple[float, int]]] = [[] for _ in range(n)]
+
+    # Candidate pairs batched per lower index: one distances_to call per row,
+    # i.e. one vector op per row for the numeric metrics.
+    partners: List[List[int]] = [[] for _ in range(n)]
+    for i, j in candidate_pairs(field, window):
+        partners[i].append(j)
+    for i, js in enumerate(partners):
+        if not js:
+            continue
+        js.sort()
+        for j, d in zip(js, field.distances_to(i, js).tolist()):
+            candidates[i].append((d, j))
+            candidates[j].append((d, i))
+
+    # Shared landmarks rather than independent samples per row: every row's far
+    # estimate carries the same sampling error, so their ranking stays stable.
+    # Each landmark's distances to all cases come from one distances_from call.
+    import random
+
+    landmarks = random.Random(seed).sample(range(n), min(samples, n))
+    totals = [0.0] * n
+    counts = [0] * n
+    for j in landmarks:
+        for i, d in enumerate(field.distances_from(j).tolist()):
+            if i == j:
+                continue
+            totals[i] += d
+            counts[i] += 1
+            candidates[i].append((d, j))
+    far = [total / count if count else 0.0 for total, count in zip(totals, counts)]
+
+    indptr, indices, data = [0], [], []
+    for i in range(n):
+        best = heapq.nsmallest(k, set(candidates[i]))
+        indices.extend(j for _, j in best)
+        data.extend(d for d, _ in best)
+        indptr.append(len(indices))
+    return KnnGraph(list(ids), k, indptr, indices, data, far, field.metric)
+
+def knn_path(dense_path: str) -> str:
+    """Sparse store that sits next to a dense matrix file, e.g. input.json -> input-knn.json."""
+    root, ext = os.path.splitext(dense_path)
+    return f"{root}-knn{ext}"
+
+def _ranks(xs: Sequence[float]) -> List[float]:
+    order = sorted(range(len(xs)), key=lambda i: xs[i])
+    ranks = [0.0] * len(xs)
+    p = 0
+    while p < len(order):
+        q = p
+        while q + 1 < len(order) and xs[order[q + 1]] == xs[order[p]]:
+            q += 1
+        for r in range(p, q + 1):
+            ranks[order[r]] = (p + q) / 2.0
+        p = q + 1
+    return ranks
+
+def spearman(xs: Sequence[float], ys: Sequence[float]) -> float:
+    rx, ry = _ranks(xs), _ranks(ys)
+    n = len(xs)
+    mx, my = sum(rx) / n, sum(ry) / n
+    cov = sum((a - mx) * (b - my) for a, b in zip(rx, ry))
+    vx = sum((a - mx) ** 2 for a in rx)
+    vy = sum((b - my) ** 2 for b in ry)
+    return cov / (vx * vy) ** 0.5 if vx and vy else 1.0
+
+def evaluate(ids: List[str], field, k: int, window: int, samples: int) -> Dict[str, float]:
+    """
+    Compare a KnnGraph against exact all-pairs distances.
+    - recall: share of stored neighbours within the exact k-th neighbour distance
+      (tie-aware, since many cases share the same distance)
+    - spearman: rank correlation of estimated vs exact row-average distance
+    - top_decile_overlap: overlap of the 10% most diverse cases under each score
+    """
+    n = len(ids)
+    exact = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j, d in enumerate(field.row(i), start=i + 1):
+            exact[i][j] = exact[j][i] = float(d)
+    graph = build_knn(ids, field, k, window, samples)
+
+    hits = total = 0
+    for i in range(n):
+        row = sorted(exact[i][j] for j in range(n) if j != i)
+        if not row:
+            continue
+        kth = row[min(k, len(row)) - 1]
+        found = graph.data[graph.indptr[i]:graph.indptr[i + 1]]
+        hits += sum(1 for d in found if d <= kth)
+        total += min(k, len(row))
+
+    exact_mean = [sum(r) / max(n - 1, 1) for r in exact]
+    est_mean = graph.estimated_row_mean()
+    top = max(1, n // 10)
+    exact_top = set(sorted(range(n), key=lambda i: (-exact_mean[i], ids[i]))[:top])
+    est_top = set(sorted(range(n), key=lambda i: (-est_mean[i], ids[i]))[:top])
+    return {
+        "cases": n,
+        "recall": hits / total if total else 1.0,
+        "spearman": spearman(exact_mean, est_mean),
+        "top_decile_overlap": len(exact_top & est_top) / top,
+        "stored_pairs": len(graph.indices),
+        "exact_pairs": n * (n - 1) // 2,
+    }
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the sparse kNN approximation against exact distances.")
+    parser.add_argument("command", choices=["evaluate"])
+    parser.add_argument("--cases", default=os.path.join("test", "test-cases.json"))
+    parser.add_argument("--field", default="input", choices=["input", "output"])
+    parser.add_argument("--metric", default="levenshtein", choices=METRICS)
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    args = parser.parse_args(argv)
+
+    with open(args.cases, "r") as f:
+        test_cases = json.load(f)
+    ids = list(test_cases.keys())
+    field = prepare_field(args.metric, ids, {tid: test_cases[tid].get(args.field, "") for tid in ids})
+    stats = evaluate(ids, field, args.k, args.window, args.samples)
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
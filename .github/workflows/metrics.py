@@ -0,0 +1,258 @@
+"""
+Distance metrics for test-case fields (input, output).
+
+Each metric turns a field's {id: values} map into a prepared field object with
+  - row(i):   distances from case i to every case j > i (vectorized per row)
+  - distances_from(i): distances from case i to every case
+  - pair(i, j): a single distance
+  - distances_to(i, js): distances from case i to each case in js (one batch)
+  - blocking_keys(i): sort keys used by the sparse kNN mode (knn.py)
+Every distance is the minimum over all value combinations of the two cases,
+lies in [0, 1], and is 0.0 when either case has no values.
+
+Metrics:
+  - levenshtein: normalized Levenshtein distance of the stringified values
+  - absdiff:     |a - b| scaled by the field's value range
+  - relerr:      |a - b| / max(|a|, |b|), capped at 1
+  - logratio:    |slog(a) - slog(b)| scaled by the field's range, slog(x) = sign(x) * log(1 + |x|)
+The numeric metrics work on preconverted float arrays and never stringify.
+"""
+import os
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+# Heavy modules are imported on first use: a small string-only suite needs
+# neither, and importing them would dominate the stage's runtime.
+np = None
+
+def _numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+# Suites from this size up switch to rapidfuzz; below it the import costs more than it saves.
+FAST_LEVENSHTEIN_MIN_CASES = 200
+
+def levenshtein_distance(s1, s2):
+    """Fast Levenshtein distance for two strings."""
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    if not s2:
+        return len(s1)
+    prev = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        curr = [i + 1]
+        for j, c2 in enumerate(s2):
+            curr.append(min(prev[j + 1] + 1, curr[j] + 1, prev[j] + (c1 != c2)))
+        prev = curr
+    return prev[-1]
+
+# rapidfuzz.process.cdist with the normalized Levenshtein scorer, once enabled.
+_cdist = None
+
+def enable_fast_levenshtein() -> bool:
+    """
+    Optional: use rapidfuzz if installed (same results, faster): for
+    levenshtein_distance, and for whole StringField rows via process.cdist.
+    """
+    global levenshtein_distance, _cdist
+    try:
+        from rapidfuzz.distance import Levenshtein
+        from rapidfuzz.process import cdist
+    except ImportError:
+        return False
+    levenshtein_distance = Levenshtein.distance
+
+    def normalized_cdist(queries, choices):
+        # normalized_distance divides by the longer length too, and gives 0.0 for two empty strings.
+        return cdist(queries, choices, scorer=Levenshtein.normalized_distance, dtype=_numpy().float64)
+
+    _cdist = normalized_cdist
+    return True
+
+@lru_cache(maxsize=4096)
+def normalized_levenshtein(s1: str, s2: str) -> float:
+    if not s1 and not s2:
+        return 0.0
+    maxlen = max(len(s1), len(s2))
+    if maxlen == 0:
+        return 0.0
+    return levenshtein_distance(s1, s2) / maxlen
+
+def min_normalized_levenshtein(vals1: List[Any], vals2: List[Any]) -> float:
+    """Compute minimum normalized Levenshtein distance between two lists of values."""
+    dists = [
+        normalized_levenshtein(str(v1), str(v2))
+        for v1 in vals1 for v2 in vals2
+    ]
+    return min(dists) if dists else 0.0
+
+def as_value_list(vals: Any) -> List[Any]:
+    return vals if isinstance(vals, list) else [vals]
+
+def stringify_values(ids: List[str], values_dict: Dict[str, Any]) -> List[List[str]]:
+    """Values per id (in ids order) as lists of strings, converted once up front."""
+    return [[str(v) for v in as_value_list(values_dict.get(tid, []))] for tid in ids]
+
+class StringField:
+    """
+    Stringified values per case, compared by min normalized Levenshtein.
+    With rapidfuzz enabled, a row is one cdist call over the flattened values of
+    all cases, reduced to a min per case; otherwise a loop over pairs.
+    """
+
+    metric = "levenshtein"
+
+    def __init__(self, values: List[List[str]]):
+        self.values = values
+        self.flat = [v for vals in values for v in vals]
+        # Case c owns flat[starts[c]:starts[c + 1]].
+        self.starts = [0]
+        for vals in values:
+            self.starts.append(self.starts[-1] + len(vals))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _cdist_min(self, i: int, choices: List[str], counts: List[int]):
+        """
+        Min over value combinations of case i against consecutive cases holding
+        counts[c] of the choices each, via one cdist call. Cases with no values get 0.0.
+        """
+        np = _numpy()
+        out = np.zeros(len(counts), dtype=np.float64)
+        if not self.values[i] or not choices:
+            return out
+        d = _cdist(self.values[i], choices).min(axis=0)
+        counts = np.asarray(counts, dtype=np.int64)
+        has = counts > 0
+        out[has] = np.minimum.reduceat(d, np.concatenate(([0], np.cumsum(counts[has])[:-1])))
+        return out
+
+    def _cdist_from(self, i: int, start: int):
+        """Distances from case i to cases [start, n), via _cdist_min."""
+        counts = [b - a for a, b in zip(self.starts[start:-1], self.starts[start + 1:])]
+        return self._cdist_min(i, self.flat[self.starts[start]:], counts)
+
+    def row(self, i: int):
+        if _cdist is not None:
+            return self._cdist_from(i, i + 1)
+        vals1 = self.values[i]
+        return array("d", [min_normalized_levenshtein(vals1, vals2) for vals2 in self.values[i + 1:]])
+
+    def pair(self, i: int, j: int) -> float:
+        return min_normalized_levenshtein(self.values[i], self.values[j])
+
+    def distances_from(self, i: int):
+        """Distances from case i to every case (including itself, at 0.0)."""
+        if _cdist is not None:
+            return self._cdist_from(i, 0)
+        vals1 = self.values[i]
+        return array("d", [min_normalized_levenshtein(vals1, vals2) for vals2 in self.values])
+
+    def distances_to(self, i: int, js: List[int]):
+        if _cdist is not None:
+            choices = [self.flat[p] for j in js for p in range(self.starts[j], self.starts[j + 1])]
+            return self._cdist_min(i, choices, [len(self.values[j]) for j in js])
+        vals1 = self.values[i]
+        return array("d", [min_normalized_levenshtein(vals1, self.values[j]) for j in js])
+
+    def blocking_keys(self, i: int) -> List[Tuple]:
+        """(length, prefix order) and (length, suffix order) of every value."""
+        keys = []
+        for s in self.values[i]:
+            keys.append((0, len(s), s))
+            keys.append((1, len(s), s[::-1]))
+        return keys
+
+class NumericField:
+    """
+    Numeric values per case as an (n, width) float64 array, NaN-padded for
+    cases with fewer values, compared with one of the numeric metrics.
+    """
+
+    def __init__(self, values: "np.ndarray", metric: str):
+        np = _numpy()
+        if metric == "logratio":
+            values = np.sign(values) * np.log1p(np.abs(values))
+        self.values = values
+        self.metric = metric
+        finite = values[~np.isnan(values)]
+        self.scale = float(finite.max() - finite.min()) if finite.size else 0.0
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def _distances(self, x: "np.ndarray", ys: "np.ndarray") -> "np.ndarray":
+        """Min over value combinations of x (width,) against each row of ys (r, width)."""
+        np = _numpy()
+        a = x[None, :, None]
+        b = ys[:, None, :]
+        diff = np.abs(a - b)
+        if self.metric == "relerr":
+            denom = np.maximum(np.abs(a), np.abs(b))
+            d = np.minimum(np.divide(diff, denom, out=np.zeros_like(diff), where=denom > 0), 1.0)
+        elif self.scale > 0:
+            d = diff / self.scale
+        else:
+            d = np.zeros_like(diff)
+        # Padding never wins the min; cases with no values at all get 0.0.
+        d = np.where(np.isnan(diff), np.inf, d)
+        best = d.min(axis=(1, 2)) if d.size else np.zeros(ys.shape[0])
+        best[np.isinf(best)] = 0.0
+        return best
+
+    def row(self, i: int) -> "np.ndarray":
+        return self._distances(self.values[i], self.values[i + 1:])
+
+    def pair(self, i: int, j: int) -> float:
+        return float(self._distances(self.values[i], self.values[j:j + 1])[0])
+
+    def distances_from(self, i: int) -> "np.ndarray":
+        """Distances from case i to every case (including itself, at 0.0)."""
+        return self._distances(self.values[i], self.values)
+
+    def distances_to(self, i: int, js: List[int]) -> "np.ndarray":
+        return self._distances(self.values[i], self.values[js])
+
+    def blocking_keys(self, i: int) -> List[Tuple]:
+        """(operand position, value) of every value, so sorted order groups close values."""
+        np = _numpy()
+        return [(a, float(v)) for a, v in enumerate(self.values[i]) if not np.isnan(v)]
+
+NUMERIC_METRICS = ("absdiff", "relerr", "logratio")
+METRICS = ("levenshtein",) + NUMERIC_METRICS
+
+def numeric_values(ids: List[str], values_dict: Dict[str, Any], metric: str) -> "np.ndarray":
+    np = _numpy()
+    rows = [as_value_list(values_dict.get(tid, [])) for tid in ids]
+    width = max((len(r) for r in rows), default=0)
+    out = np.full((len(ids), max(width, 1)), np.nan, dtype=np.float64)
+    for i, (tid, vals) in enumerate(zip(ids, rows)):
+        for a, v in enumerate(vals):
+            if v is None or v == "":
+                continue
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                raise ValueError(f"Metric {metric!r} needs numeric values; {tid} has {v!r}")
+            out[i, a] = v
+    return out
+
+def prepare_field(metric: str, ids: List[str], values_dict: Dict[str, Any]):
+    """Preconvert one field's values for the named metric."""
+    if metric == "levenshtein":
+        if len(ids) >= FAST_LEVENSHTEIN_MIN_CASES:
+            enable_fast_levenshtein()
+        return StringField(stringify_values(ids, values_dict))
+    if metric in NUMERIC_METRICS:
+        return NumericField(numeric_values(ids, values_dict, metric), metric)
+    raise ValueError(f"Unknown distance metric: {metric!r} (choose from {', '.join(METRICS)})")
+
+def resolve_metric(key: str) -> str:
+    """Distance metric for a field from SETUP_<KEY>_METRIC, e.g. SETUP_INPUT_METRIC=absdiff."""
+    metric = os.environ.get(f"SETUP_{key.upper()}_METRIC", "levenshtein").strip().lower()
+    if metric not in METRICS:
+        raise ValueError(f"Unknown SETUP_{key.upper()}_METRIC: {metric!r} (choose from {', '.join(METRICS)})")
+    return metric
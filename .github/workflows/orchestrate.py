@@ -0,0 +1,235 @@
+"""
+Local orchestrator for the generate -> setup -> prioritize -> execute pipeline.
+
+In CI each hop is a push, a Code.gs webhook, a repository_dispatch and a fresh
+runner. Here the same DAG runs in one process: a stage's changed artifacts are
+routed with the same rules as Code.gs doPost (first added or modified file
+wins, deletions trigger nothing, [skip-execute] suppresses execution), and only the stages those changes
+require are run. Stage modules are imported once, and each stage hands its
+results to the next in memory: generate's cases go to setup, setup's distance
+buffers (or kNN graphs) to prioritize, and the order and parsed cases to
+execute, so nothing a stage just wrote is read back from disk. Disk is written
+only for the artifacts the workflows commit or upload.
+
+Artifacts are written exactly as the workflows write them; with --commit each
+push is also committed with the workflow's commit message.
+
+    python .github/workflows/orchestrate.py                       # route uncommitted changes
+    python .github/workflows/orchestrate.py --changed test/test-cases.json
+    python .github/workflows/orchestrate.py --event generate-tests --commit
+    python .github/workflows/orchestrate.py --event generate-tests --dry-run
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+class Push(NamedTuple):
+    paths: List[str]  # added or modified, as Code.gs detectFile sees them
+    message: str
+    removed: Tuple[str, ...] = ()
+
+# (path, event) in Code.gs doPost order; the first path a push touches wins.
+RULES = [
+    (".github/workflows/generate.py", "generate-tests"),
+    ("test/test-cases.json", "setup-matrices"),
+    ("test/tcp.json", "execute-tests"),
+    ("Code.gs", "execute-tests"),
+    ("test/string-distances/input.json", "prioritize-cases"),
+    ("test/string-distances/input-knn.json", "prioritize-cases"),
+]
+SKIP_MARKER = "[skip-execute]"
+# Guards against a routing loop; a full cycle is four hops.
+MAX_HOPS = 16
+
+def route(push: Push) -> Optional[str]:
+    """Event a push would trigger via Code.gs, or None."""
+    for path, event in RULES:
+        if path in push.paths:
+            if path == "test/tcp.json" and SKIP_MARKER in push.message:
+                return None
+            return event
+    return None
+
+def snapshot(roots: List[str]) -> Dict[str, str]:
+    """Content digest of every file under roots (files or directories)."""
+    out = {}
+    for root in roots:
+        if os.path.isfile(root):
+            files = [root]
+        else:
+            files = [os.path.join(d, f) for d, _, names in os.walk(root) for f in names]
+        for path in files:
+            if "__pycache__" in path:
+                continue
+            with open(path, "rb") as f:
+                out[path.replace(os.sep, "/")] = hashlib.sha1(f.read()).hexdigest()
+    return out
+
+class LocalDispatcher:
+    """Runs each dispatched stage in this process, mirroring its workflow file."""
+
+    def __init__(self, commit: bool = False):
+        self.commit = commit
+        # Shared between stages: results the workflows pass via step outputs, plus
+        # "cases", "matrices"/"matrix_ids" and "tcp_order" (see the stages below).
+        self.state: Dict[str, object] = {}
+
+    def dispatch(self, event: str) -> List[Push]:
+        stages = {
+            "generate-tests": self.generate_tests,
+            "setup-matrices": self.setup_matrices,
+            "prioritize-cases": self.prioritize_cases,
+            "execute-tests": self.execute_tests,
+        }
+        start = time.perf_counter()
+        pushes = [p for p in stages[event]() if p is not None]
+        print(f"[orchestrate] {event} finished in {time.perf_counter() - start:.2f}s")
+        return pushes
+
+    def _step(self, run: Callable[[], object], paths: List[str], message: Union[str, Callable[[List[str]], str]]) -> Optional[Push]:
+        """Runs one step and returns the push its changes to paths would make (None if unchanged)."""
+        before = snapshot(paths)
+        run()
+        after = snapshot(paths)
+        changed = sorted(p for p in set(before) | set(after) if before.get(p) != after.get(p))
+        if not changed:
+            return None
+        msg = message(changed) if callable(message) else message
+        if self.commit:
+            subprocess.run(["git", "add", "-A", "--"] + changed, check=True)
+            subprocess.run(["git", "commit", "-q", "-m", msg], check=True)
+        return Push([p for p in changed if p in after], msg, tuple(p for p in changed if p not in after))
+
+    def generate_tests(self) -> List[Optional[Push]]:
+        import generate
+
+        def run():
+            self.state.clear()
+            self.state["cases"] = generate.main()
+            os.makedirs("test/test-scripts", exist_ok=True)
+            fault_dir = "test/fault-matrices"
+            os.makedirs(fault_dir, exist_ok=True)
+            for f in os.listdir(fault_dir):
+                path = os.path.join(fault_dir, f)
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        paths = ["test/test-cases.json", "test/test-scripts", "test/fault-matrices"]
+        return [self._step(run, paths, "Generate: new test cases, scripts, and emptied fault matrices")]
+
+    def setup_matrices(self) -> List[Optional[Push]]:
+        import setup
+
+        def message(changed):
+            input_changed = any("/input" in p for p in changed)
+            output_changed = any("/output" in p for p in changed)
+            if input_changed and output_changed:
+                return "Setup: input and output string distance matrices updated"
+            if input_changed:
+                return "Setup: input string distance matrix updated"
+            return "Setup: output string distance matrix updated"
+
+        def run():
+            result = setup.main(self.state.get("cases"), keep=True)
+            if result is not None:
+                self.state["cases"] = result["cases"]
+                self.state["matrices"] = result["matrices"]
+                self.state["matrix_ids"] = result["ids"]
+
+        return [self._step(run, ["test/string-distances"], message)]
+
+    def _prioritize(self):
+        import prioritize
+        self.state["tcp_order"] = prioritize.main(self.state.get("cases"), self.state.get("matrices"),
+                                                  self.state.get("matrix_ids"), write_scores=False)
+
+    def prioritize_cases(self) -> List[Optional[Push]]:
+        return [self._step(self._prioritize, ["test/tcp.json"], "Prioritize: updated tcp.json")]
+
+    def execute_tests(self) -> List[Optional[Push]]:
+        import compact
+        import execute
+
+        def run():
+            # Whatever is not passed in is read from disk; its cache may predate this run.
+            execute._TCP_ORDER = None
+            execute._TEST_CASES = None
+            self.state["all_passed"], self.state["apfd_score"] = execute.main(self.state.get("tcp_order"), self.state.get("cases"))
+            compact.main()
+
+        pushes = [self._step(run, ["test/fault-matrices"],
+                             lambda _: f"Execute: new fault matrix (APFD: {self.state['apfd_score']:.4f})")]
+        if not self.state["all_passed"]:
+            print("Failures detected; reprioritizing for next execution cycle...")
+            pushes.append(self._step(self._prioritize, ["test/tcp.json"],
+                                     f"{SKIP_MARKER} Reprioritize: updated tcp.json for next cycle"))
+        return pushes
+
+# Primary artifact each stage commits, for dry runs.
+DRY_RUN_OUTPUTS = {
+    "generate-tests": [Push(["test/fault-matrices/V1.json", "test/test-cases.json"], "Generate: new test cases, scripts, and emptied fault matrices")],
+    "setup-matrices": [Push(["test/string-distances/input.json", "test/string-distances/output.json"], "Setup: input and output string distance matrices updated")],
+    "prioritize-cases": [Push(["test/tcp.json"], "Prioritize: updated tcp.json")],
+    "execute-tests": [Push(["test/fault-matrices/V2.json"], "Execute: new fault matrix (APFD: 1.0000)")],
+}
+
+class RecordingDispatcher:
+    """Offline stand-in: records dispatched events and replies with canned pushes."""
+
+    def __init__(self, outputs: Optional[Dict[str, List[Push]]] = None):
+        self.outputs = DRY_RUN_OUTPUTS if outputs is None else outputs
+        self.events: List[str] = []
+
+    def dispatch(self, event: str) -> List[Push]:
+        self.events.append(event)
+        return list(self.outputs.get(event, []))
+
+def run_pipeline(dispatcher, pushes: List[Push], max_hops: int = MAX_HOPS) -> List[str]:
+    """Routes pushes to events until no push triggers anything; returns the events run."""
+    events = []
+    queue = list(pushes)
+    while queue:
+        push = queue.pop(0)
+        event = route(push)
+        if event is None:
+            continue
+        if len(events) >= max_hops:
+            raise RuntimeError(f"Pipeline exceeded {max_hops} stages: {' -> '.join(events)}")
+        print(f"[orchestrate] {', '.join(push.paths)} changed -> {event}")
+        events.append(event)
+        queue.extend(dispatcher.dispatch(event))
+    return events
+
+def uncommitted_push(message: str) -> Push:
+    """Uncommitted changes as a push: deleted files go to removed, everything else to paths."""
+    out = subprocess.run(["git", "status", "--porcelain", "--untracked-files=all"], capture_output=True, text=True, check=True).stdout
+    paths, removed = [], []
+    for line in out.splitlines():
+        if line.strip():
+            (removed if "D" in line[:2] else paths).append(line[3:].split(" -> ")[-1])
+    return Push(sorted(paths), message, tuple(sorted(removed)))
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run the test pipeline locally with Code.gs routing.")
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument("--changed", nargs="+", metavar="PATH", help="treat these paths as just pushed (default: uncommitted changes)")
+    start.add_argument("--event", choices=sorted({event for _, event in RULES}), help="start by dispatching this event")
+    parser.add_argument("--message", default="", help="commit message of the initial push (e.g. containing [skip-execute])")
+    parser.add_argument("--commit", action="store_true", help="commit each stage's artifacts with the workflow's message")
+    parser.add_argument("--dry-run", action="store_true", help="only print the stages that would run")
+    args = parser.parse_args(argv)
+
+    dispatcher = RecordingDispatcher() if args.dry_run else LocalDispatcher(commit=args.commit)
+    if args.event:
+        pushes = dispatcher.dispatch(args.event)
+        events = [args.event] + run_pipeline(dispatcher, pushes)
+    else:
+        pushes = [Push(args.changed, args.message) if args.changed else uncommitted_push(args.message)]
+        events = run_pipeline(dispatcher, pushes)
+    print(f"[orchestrate] stages run: {' -> '.join(events) if events else 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,68 @@
 import os
 import json
-import numpy as np
 import re
-from typing import Dict, List, Tuple
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from knn import KnnGraph, knn_path
+from metrics import _numpy
+
+# Suites below this many cases are scored in pure Python: importing NumPy
+# costs more than the whole computation. Both paths give identical results.
+NUMPY_MIN_CASES = 500
+
+def use_numpy(n):
+    return n >= int(os.environ.get("TCP_NUMPY_MIN_CASES", NUMPY_MIN_CASES))
+
+TC_PATH = "test/test-cases.json"
+INPUT_PATH = "test/string-distances/input.json"
+OUTPUT_PATH = "test/string-distances/output.json"
+FAULT_DIR = "test/fault-matrices"
+
+def load_weights():
+    """(alpha, beta, gamma, decay), tunable via TCP_ALPHA, TCP_BETA, TCP_GAMMA and REWARD_DECAY."""
+    alpha = float(os.environ.get("TCP_ALPHA", "0.5"))
+    beta = float(os.environ.get("TCP_BETA", "0.5"))
+    gamma = float(os.environ.get("TCP_GAMMA", "1.0"))
+    decay = float(os.environ.get("REWARD_DECAY", "0.7"))
+    return alpha, beta, gamma, decay
+
+def f32(xs):
+    """Rounds floats to float32, as the NumPy path stores them."""
+    return array("f", xs).tolist()
+
+def f32_sum(xs):
+    """Float32 sum in the order NumPy's pairwise summation adds them."""
+    n = len(xs)
+    if n < 8:
+        res = 0.0
+        for x in xs:
+            res = f32([res + x])[0]
+        return res
+    if n <= 128:
+        end = n - n % 8
+        r = xs[:8]
+        for i in range(8, end, 8):
+            r = f32([a + b for a, b in zip(r, xs[i:i + 8])])
+        r = f32([r[0] + r[1], r[2] + r[3], r[4] + r[5], r[6] + r[7]])
+        r = f32([r[0] + r[1], r[2] + r[3]])
+        res = f32([r[0] + r[1]])[0]
+        for x in xs[end:]:
+            res = f32([res + x])[0]
+        return res
+    half = n // 2
+    half -= half % 8
+    return f32([f32_sum(xs[:half]) + f32_sum(xs[half:])])[0]
+
+def f32_axpy(a, xs, b, ys):
+    """Float32 a * xs + b * ys, elementwise, rounding after each operation like NumPy."""
+    a, b = f32([a, b])
+    return f32([x + y for x, y in zip(f32([a * x for x in xs]), f32([b * y for y in ys]))])
+
+def mean(vec):
+    if isinstance(vec, list):
+        return f32([f32_sum(vec) / len(vec)])[0] if vec else 0.0
+    return float(_numpy().mean(vec)) if vec.size else 0.0
 
 def load_json(path):
     with open(path, "r") as f:
@@ -27,11 +87,18 @@ def check_test_cases(path):
         print(f"ERROR: test-cases.json formatting issue: {e}")
         return None
 
-def load_matrix(path, ids):
+def load_matrix(path, ids, use_np=True):
     """
-    Loads a square matrix dict[id1][id2] -> float into a numpy array aligned to ids.
+    Loads a square matrix dict[id1][id2] -> float into a numpy array aligned to ids
+    (a list of float32-rounded rows if not use_np).
     If file doesn't exist, returns zeros.
     """
+    if not use_np:
+        if not os.path.isfile(path):
+            return [[0.0] * len(ids) for _ in ids]
+        m = load_json(path)
+        return [f32([float(m.get(id1, {}).get(id2, 0.0)) for id2 in ids]) for id1 in ids]
+    np = _numpy()
     if not os.path.isfile(path):
         return np.zeros((len(ids), len(ids)), dtype=np.float32)
     m = load_json(path)
@@ -42,6 +109,68 @@ def load_matrix(path, ids):
             arr[i, j] = float(row.get(id2, 0.0))
     return arr
 
+def matrix_from_condensed(src_ids, buf, ids, use_np=True):
+    """
+    A condensed upper-triangle buffer from setup.py (over src_ids) as load_matrix
+    returns the matrix setup.py writes from it, aligned to ids. JSON round-trips
+    float64 exactly, so this is identical to reading the file back.
+    """
+    n = len(src_ids)
+    pos = {tid: k for k, tid in enumerate(src_ids)}
+    perm = [pos.get(tid) for tid in ids]
+    if not use_np:
+        def dist(a, b):
+            if a is None or b is None or a == b:
+                return 0.0
+            if a > b:
+                a, b = b, a
+            return buf[a * n - a * (a + 1) // 2 + (b - a - 1)]
+        return [f32([dist(a, b) for b in perm]) for a in perm]
+    np = _numpy()
+    full = np.zeros((n + 1, n + 1), dtype=np.float64)
+    if n > 1:
+        full[np.triu_indices(n, 1)] = np.frombuffer(buf, dtype=np.float64)
+        full[:n, :n] += full[:n, :n].T
+    # Index n is an all-zero row/column for ids setup.py did not see.
+    idx = np.array([n if a is None else a for a in perm], dtype=np.int64)
+    return full[np.ix_(idx, idx)].astype(np.float32)
+
+def knn_average(graph, ids, use_np=True):
+    """Estimated row-average distances of a KnnGraph aligned to ids; cases missing from it get 0.0."""
+    est = dict(zip(graph.ids, graph.estimated_row_mean()))
+    vec = [est.get(tid, 0.0) for tid in ids]
+    if not use_np:
+        return f32(vec)
+    np = _numpy()
+    return np.array(vec, dtype=np.float32)
+
+def load_knn_average(path, ids, use_np=True):
+    """
+    Loads a sparse kNN store (see knn.py) into a vector of estimated row-average
+    distances aligned to ids. Cases missing from the store get 0.0.
+    """
+    return knn_average(KnnGraph.load(path), ids, use_np)
+
+def load_similarity(path, ids, use_np=True):
+    """
+    Dense matrix at path if present, otherwise the estimated row averages from
+    its sparse kNN sibling, otherwise zeros.
+    """
+    if not os.path.isfile(path) and os.path.isfile(knn_path(path)):
+        return load_knn_average(knn_path(path), ids, use_np)
+    return load_matrix(path, ids, use_np)
+
+def average_distance(mat, n):
+    """Per-row average of a dense (n, n) matrix; (n,) vectors are already averages."""
+    denom = max(n - 1, 1)
+    if isinstance(mat, list):
+        if mat and isinstance(mat[0], list):
+            return f32([f32_sum(row) / denom for row in mat])
+        return mat
+    if mat.ndim == 1:
+        return mat
+    return _numpy().sum(mat, axis=1) / denom
+
 def list_fault_versions(dir_path) -> List[Tuple[int, str]]:
     if not os.path.isdir(dir_path):
         return []
@@ -55,39 +184,157 @@ def list_fault_versions(dir_path) -> List[Tuple[int, str]]:
                 pass
     return sorted(out, key=lambda x: x[0])
 
-def get_reward_from_history(dir_path: str, ids: List[str], decay: float = 0.7) -> np.ndarray:
+CHECKPOINT_FILE = "checkpoint.json"
+
+def load_checkpoint(dir_path):
     """
-    Build a reward vector using an EMA over all fault matrices.
-    - Each matrix is a per-TCID {id: 0|1}, where 1 indicates failure.
-    - decay in [0,1): higher means longer memory; 0.7 favors recent cycles.
-    Returns zeros if no history is present.
+    Loads the compacted-history checkpoint written by compact_fault_history,
+    or None if there is none. Its fields:
+    - version: highest V{n} folded in; raw versions <= version are ignored
+    - cycles: number of versions folded in
+    - decay: EMA decay the rewards were folded with
+    - reward: {id: EMA reward after the folded versions}
+    - default_reward: reward of an id that never appeared (0.5 decayed `cycles` times)
+    - failures: {id: failure count}; last_failure: {id: last failing version}
     """
-    versions = list_fault_versions(dir_path)
-    if not versions:
-        return np.zeros(len(ids), dtype=np.float32)
+    path = os.path.join(dir_path, CHECKPOINT_FILE)
+    if not os.path.isfile(path):
+        return None
+    try:
+        return load_json(path)
+    except Exception as e:
+        print(f"WARNING: ignoring unreadable {path}: {e}")
+        return None
 
-    r = np.full(len(ids), 0.5, dtype=np.float32)
-    alpha = 1.0 - decay  # EMA update factor
-    for _, path in versions:
+def load_fault_maps(versions):
+    """Loads (n, path) fault matrices as (n, {id: 0|1}) pairs, skipping unreadable files."""
+    out = []
+    for n, path in versions:
         try:
-            vmap = load_json(path)
+            out.append((n, load_json(path)))
         except Exception:
             continue
-        v = np.array([float(vmap.get(tid, 0.0)) for tid in ids], dtype=np.float32)
+    return out
+
+def fold_rewards(keys, checkpoint, vmaps, decay, use_np=True):
+    """
+    Applies the EMA update of each fault matrix in vmaps, in order, starting
+    from the checkpoint (or 0.5 everywhere without one). The last slot of the
+    returned float32 vector tracks an id absent from every matrix, so that
+    folding in stages reproduces the rewards of a single pass exactly.
+    """
+    if checkpoint is None:
+        r = [0.5] * (len(keys) + 1)
+    else:
+        if abs(float(checkpoint.get("decay", decay)) - decay) > 1e-12:
+            print(f"WARNING: checkpoint folded with decay={checkpoint.get('decay')}, using it with decay={decay}")
+        default = checkpoint["default_reward"]
+        saved = checkpoint["reward"]
+        r = [saved.get(tid, default) for tid in keys] + [default]
+    alpha = 1.0 - decay  # EMA update factor
+    if not use_np:
+        r = f32(r)
+        for vmap in vmaps:
+            v = f32([float(vmap.get(tid, 0.0)) for tid in keys] + [0.0])
+            r = f32_axpy(decay, r, alpha, v)
+        return r
+    np = _numpy()
+    r = np.array(r, dtype=np.float32)
+    for vmap in vmaps:
+        v = np.array([float(vmap.get(tid, 0.0)) for tid in keys] + [0.0], dtype=np.float32)
         r = decay * r + alpha * v
     return r
 
+def get_reward_from_history(dir_path: str, ids: List[str], decay: float = 0.7, use_np: bool = True):
+    """
+    Build a reward vector using an EMA over all fault matrices.
+    - Each matrix is a per-TCID {id: 0|1}, where 1 indicates failure.
+    - decay in [0,1): higher means longer memory; 0.7 favors recent cycles.
+    - Versions folded into checkpoint.json by compaction are resumed from the
+      checkpoint, giving the same rewards as replaying every raw version.
+    Returns zeros if no history is present.
+    """
+    checkpoint = load_checkpoint(dir_path)
+    folded = checkpoint["version"] if checkpoint else 0
+    versions = [(n, path) for n, path in list_fault_versions(dir_path) if n > folded]
+    if not versions and checkpoint is None:
+        if not use_np:
+            return [0.0] * len(ids)
+        np = _numpy()
+        return np.zeros(len(ids), dtype=np.float32)
+    r = fold_rewards(ids, checkpoint, [vmap for _, vmap in load_fault_maps(versions)], decay, use_np)
+    return r[:-1]
+
+def compact_fault_history(dir_path: str, keep: int = 30, decay: float = 0.7):
+    """
+    Folds all but the newest `keep` raw V{n}.json files into checkpoint.json
+    (EMA rewards plus per-TCID failure counts and last-failure version), then
+    deletes the folded files. keep is at least 1 so the next version number
+    can still be derived from the directory. Returns the number of files folded.
+    Raises ValueError if checkpoint.json exists but cannot be read: refolding
+    from scratch would overwrite the history it holds.
+    """
+    keep = max(1, keep)
+    checkpoint = load_checkpoint(dir_path)
+    if checkpoint is None and os.path.isfile(os.path.join(dir_path, CHECKPOINT_FILE)):
+        raise ValueError(f"{os.path.join(dir_path, CHECKPOINT_FILE)} is unreadable; not compacting")
+    folded = checkpoint["version"] if checkpoint else 0
+    versions = [(n, path) for n, path in list_fault_versions(dir_path) if n > folded]
+    old = versions[:-keep]
+    if not old:
+        return 0
+
+    vmaps = load_fault_maps(old)
+    keys = set(checkpoint["reward"]) if checkpoint else set()
+    for _, vmap in vmaps:
+        keys.update(vmap)
+    keys = sorted(keys)
+    r = fold_rewards(keys, checkpoint, [vmap for _, vmap in vmaps], decay, use_numpy(len(keys)))
+
+    failures = dict(checkpoint["failures"]) if checkpoint else {}
+    last_failure = dict(checkpoint["last_failure"]) if checkpoint else {}
+    for n, vmap in vmaps:
+        for tid, value in vmap.items():
+            if float(value) >= 1.0:
+                failures[tid] = failures.get(tid, 0) + 1
+                last_failure[tid] = n
+
+    save_json(os.path.join(dir_path, CHECKPOINT_FILE), {
+        "version": old[-1][0],
+        "cycles": (checkpoint["cycles"] if checkpoint else 0) + len(vmaps),
+        "decay": decay,
+        "reward": {tid: float(r[i]) for i, tid in enumerate(keys)},
+        "default_reward": float(r[-1]),
+        "failures": failures,
+        "last_failure": last_failure,
+    })
+    # Only delete once the checkpoint that replaces them is on disk.
+    for _, path in old:
+        os.remove(path)
+    return len(old)
+
 def prioritize_order(ids, input_mat, output_mat, reward_vec, alpha=0.5, beta=0.5, gamma=1.0):
     """
     Score = alpha * avg_input_distance + beta * avg_output_distance + gamma * reward
-    - avg distances are per-row averages in [0,1]
+    - avg distances are per-row averages in [0,1]; input_mat/output_mat may be
+      dense (n, n) matrices or (n,) estimated averages from a kNN store
     - reward is from EMA of fault history in [0,1]
+    - with list inputs (the pure-Python path) scores are a list with the same values
     """
     n = len(ids)
-    denom = max(n - 1, 1)
-    avg_input = np.sum(input_mat, axis=1) / denom
-    avg_output = np.sum(output_mat, axis=1) / denom
+    avg_input = average_distance(input_mat, n)
+    avg_output = average_distance(output_mat, n)
+
+    if isinstance(reward_vec, list):
+        rows = output_mat if output_mat and isinstance(output_mat[0], list) else [output_mat]
+        if all(abs(x) <= 1e-8 for row in rows for x in row):
+            avg_output = [0.0] * n
+        scores = f32_axpy(alpha, avg_input, beta, avg_output)
+        scores = f32_axpy(1.0, scores, gamma, reward_vec)
+        order = [ids[i] for i in sorted(range(n), key=lambda i: (-scores[i], ids[i]))]
+        return order, scores
 
+    np = _numpy()
     # If output_mat was missing (all zeros), keep avg_output at zeros to avoid bias
     if np.allclose(output_mat, 0.0):
         avg_output = np.zeros_like(avg_output)
@@ -101,45 +348,204 @@ def prioritize_order(ids, input_mat, output_mat, reward_vec, alpha=0.5, beta=0.5
     order = [ids[i] for i in order_idx]
     return order, scores
 
-def main():
-    tc_path = "test/test-cases.json"
-    input_path = "test/string-distances/input.json"
-    output_path = "test/string-distances/output.json"
-    fault_dir = "test/fault-matrices"
+# Online mode: weights of the mean similarity to the failed / passed cases so far.
+ONLINE_BOOST = 1.0
+ONLINE_PENALTY = 0.1
+
+class OnlineScheduler:
+    """
+    Picks the next case during execution instead of fixing the order up front
+    (TCP_ONLINE=1 in execute.py).
+
+    Each pending case is ranked by its offline score, plus `boost` times its
+    mean similarity (1 - input distance) to the cases that failed so far,
+    minus `penalty` times its mean similarity to the cases that passed.
+    Failures and passes are averaged separately, so a failure found late in
+    a long run of passes still lifts its neighbours by up to a full `boost`,
+    and faults that cluster among similar inputs surface right after the first
+    one. Each step is O(N): one pass over a distance row and one to pick the
+    best pending case, ties going to the lower id as in prioritize_order.
+    """
+
+    def __init__(self, ids, scores, neighbours, boost=ONLINE_BOOST, penalty=ONLINE_PENALTY):
+        self.ids = list(ids)
+        self.index = {tid: i for i, tid in enumerate(self.ids)}
+        # neighbours(i) -> (indices, distances); indices None means every case.
+        self.neighbours = neighbours
+        self.boost = boost
+        self.penalty = penalty
+        self.failures = 0
+        self.passes = 0
+        self.use_np = not isinstance(scores, list)
+        n = len(self.ids)
+        if self.use_np:
+            np = _numpy()
+            self.scores = np.array(scores, dtype=np.float64)
+            # Summed similarity of each case to the failed / passed cases.
+            self.fail_sim = np.zeros(n, dtype=np.float64)
+            self.pass_sim = np.zeros(n, dtype=np.float64)
+            self.done = np.zeros(n, dtype=bool)
+        else:
+            self.scores = [float(x) for x in scores]
+            self.fail_sim = [0.0] * n
+            self.pass_sim = [0.0] * n
+            self.done = [False] * n
+        self.order: List[str] = []
+
+    def next(self) -> Optional[str]:
+        """Highest-ranked case not yet run, or None when all have run."""
+        if len(self.order) == len(self.ids):
+            return None
+        failures, passes = max(self.failures, 1), max(self.passes, 1)
+        if self.use_np:
+            np = _numpy()
+            rank = self.scores + self.boost * self.fail_sim / failures - self.penalty * self.pass_sim / passes
+            best = int(np.argmax(np.where(self.done, -np.inf, rank)))
+        else:
+            best, best_rank = -1, 0.0
+            for i, score in enumerate(self.scores):
+                if self.done[i]:
+                    continue
+                rank = score + self.boost * self.fail_sim[i] / failures - self.penalty * self.pass_sim[i] / passes
+                if best < 0 or rank > best_rank:
+                    best, best_rank = i, rank
+        self.done[best] = True
+        self.order.append(self.ids[best])
+        return self.ids[best]
+
+    def update(self, tcid: str, failed: bool):
+        """Feeds back the result of a case returned by next()."""
+        i = self.index.get(tcid)
+        if i is None:
+            return
+        if failed:
+            self.failures += 1
+            sims = self.fail_sim
+        else:
+            self.passes += 1
+            sims = self.pass_sim
+        indices, dists = self.neighbours(i)
+        if self.use_np:
+            np = _numpy()
+            sim = 1.0 - np.asarray(dists, dtype=np.float64)
+            if indices is None:
+                sims += sim
+            else:
+                sims[np.asarray(indices, dtype=np.int64)] += sim
+            return
+        pairs = enumerate(dists) if indices is None else zip(indices, dists)
+        for j, d in pairs:
+            if not self.done[j]:
+                sims[j] += 1.0 - d
+
+    def iterate(self, results: Dict[str, int]) -> Iterator[str]:
+        """
+        Yields cases in online order. The caller records each case's result in
+        results (1 = failed) before asking for the next one.
+        """
+        while True:
+            tcid = self.next()
+            if tcid is None:
+                return
+            yield tcid
+            self.update(tcid, results.get(tcid, 0) == 1)
+
+def online_neighbours(input_mat, input_path, ids):
+    """
+    neighbours(i) for OnlineScheduler: rows of the dense input matrix when it
+    was loaded, otherwise the stored neighbours from the kNN store, otherwise none.
+    """
+    if isinstance(input_mat, list) and input_mat and isinstance(input_mat[0], list):
+        return lambda i: (None, input_mat[i])
+    if not isinstance(input_mat, list) and input_mat.ndim == 2:
+        return lambda i: (None, input_mat[i])
+    if os.path.isfile(knn_path(input_path)):
+        graph = KnnGraph.load(knn_path(input_path))
+        pos = {tid: i for i, tid in enumerate(ids)}
+        to_ids = [pos.get(tid) for tid in graph.ids]
+        from_ids = [None] * len(ids)
+        for g, i in enumerate(to_ids):
+            if i is not None:
+                from_ids[i] = g
+
+        def neighbours(i):
+            g = from_ids[i]
+            pairs = [] if g is None else [(to_ids[j], d) for j, d in graph.neighbours(g) if to_ids[j] is not None]
+            return [j for j, _ in pairs], [d for _, d in pairs]
+
+        return neighbours
+    return lambda i: ([], [])
+
+def online_scheduler(cases, input_path=INPUT_PATH, output_path=OUTPUT_PATH, fault_dir=FAULT_DIR):
+    """OnlineScheduler for a suite, seeded with the scores main() would compute."""
+    ids = sorted(cases.keys())
+    use_np = use_numpy(len(ids))
+    input_mat = load_similarity(input_path, ids, use_np)
+    output_mat = load_similarity(output_path, ids, use_np)
+    alpha, beta, gamma, decay = load_weights()
+    reward_vec = get_reward_from_history(fault_dir, ids, decay=decay, use_np=use_np)
+    _, scores = prioritize_order(ids, input_mat, output_mat, reward_vec, alpha, beta, gamma)
+    boost = float(os.environ.get("TCP_ONLINE_BOOST", ONLINE_BOOST))
+    penalty = float(os.environ.get("TCP_ONLINE_PENALTY", ONLINE_PENALTY))
+    return OnlineScheduler(ids, scores, online_neighbours(input_mat, input_path, ids), boost, penalty)
+
+def similarity_from(matrices, matrix_ids, key, path, ids, use_np=True):
+    """
+    A field's similarity as load_similarity reads it, but from setup.py's
+    in-memory result (condensed buffer or KnnGraph) when matrices has it.
+    """
+    mat = (matrices or {}).get(key)
+    if mat is None:
+        return load_similarity(path, ids, use_np)
+    if isinstance(mat, KnnGraph):
+        return knn_average(mat, ids, use_np)
+    return matrix_from_condensed(matrix_ids, mat, ids, use_np)
+
+def main(cases=None, matrices=None, matrix_ids=None, write_scores=True):
+    """
+    Writes test/tcp.json and returns the order. In-process callers (orchestrate.py)
+    may pass the parsed cases and setup.main's matrices over matrix_ids instead of
+    having them read back from disk; write_scores=False skips the diagnostic tcp-scores.json.
+    """
+    tc_path = TC_PATH
+    input_path = INPUT_PATH
+    output_path = OUTPUT_PATH
+    fault_dir = FAULT_DIR
     tcp_order_path = "test/tcp.json"
     tcp_scores_path = "test/tcp-scores.json"
 
-    cases = check_test_cases(tc_path)
+    if cases is None:
+        cases = check_test_cases(tc_path)
     if cases is None:
         print("Test case check failed. Exiting.")
-        return
+        return None
 
     ids = sorted(cases.keys())
-    input_mat = load_matrix(input_path, ids)
-    output_mat = load_matrix(output_path, ids)
+    use_np = use_numpy(len(ids))
+    input_mat = similarity_from(matrices, matrix_ids, "input", input_path, ids, use_np)
+    output_mat = similarity_from(matrices, matrix_ids, "output", output_path, ids, use_np)
 
     # Allow tuning via environment variables
-    alpha = float(os.environ.get("TCP_ALPHA", "0.5"))
-    beta = float(os.environ.get("TCP_BETA", "0.5"))
-    gamma = float(os.environ.get("TCP_GAMMA", "1.0"))
-    decay = float(os.environ.get("REWARD_DECAY", "0.7"))
+    alpha, beta, gamma, decay = load_weights()
 
-    reward_vec = get_reward_from_history(fault_dir, ids, decay=decay)
+    reward_vec = get_reward_from_history(fault_dir, ids, decay=decay, use_np=use_np)
 
     tcp_order, scores = prioritize_order(ids, input_mat, output_mat, reward_vec, alpha, beta, gamma)
     save_json(tcp_order_path, tcp_order)
 
     # Optional: save scores for diagnostics (not necessarily committed)
-    try:
-        score_map = {tid: float(scores[ids.index(tid)]) for tid in ids}
-        save_json(tcp_scores_path, score_map)
-    except Exception:
-        pass
+    if write_scores:
+        try:
+            save_json(tcp_scores_path, dict(zip(ids, map(float, scores))))
+        except Exception:
+            pass
 
     # Diagnostics for quick validation
-    top5 = list(zip(tcp_order[:5], [float(scores[ids.index(t)]) for t in tcp_order[:5]]))
+    index = {tid: i for i, tid in enumerate(ids)}
+    top5 = [(t, float(scores[index[t]])) for t in tcp_order[:5]]
     print(f"TCP order saved to {tcp_order_path}. Top-5: {top5}")
-    print(f"Weights: alpha={alpha}, beta={beta}, gamma={gamma}; reward_decay={decay}; reward_mean={float(np.mean(reward_vec)) if reward_vec.size else 0.0}")
+    print(f"Weights: alpha={alpha}, beta={beta}, gamma={gamma}; reward_decay={decay}; reward_mean={mean(reward_vec)}")
+    return tcp_order
 
 if __name__ == "__main__":
     main()
@@ -1,64 +1,277 @@
 import json
 import os
 import logging
-from typing import Dict, List, Any
-from functools import lru_cache
-
-# Optional: Use rapidfuzz for faster string distance if desired, fallback to pure Python
-try:
-    from rapidfuzz.distance import Levenshtein
-    def levenshtein_distance(s1, s2):
-        return Levenshtein.distance(s1, s2)
-except ImportError:
-    def levenshtein_distance(s1, s2):
-        """Fast Levenshtein distance for two strings."""
-        if len(s1) < len(s2):
-            s1, s2 = s2, s1
-        if not s2:
-            return len(s1)
-        prev = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            curr = [i + 1]
-            for j, c2 in enumerate(s2):
-                curr.append(min(prev[j + 1] + 1, curr[j] + 1, prev[j] + (c1 != c2)))
-            prev = curr
-        return prev[-1]
-
-@lru_cache(maxsize=4096)
-def normalized_levenshtein(s1: str, s2: str) -> float:
-    if not s1 and not s2:
-        return 0.0
-    maxlen = max(len(s1), len(s2))
-    if maxlen == 0:
-        return 0.0
-    return levenshtein_distance(s1, s2) / maxlen
-
-def min_normalized_levenshtein(vals1: List[Any], vals2: List[Any]) -> float:
-    """Compute minimum normalized Levenshtein distance between two lists of values."""
-    dists = [
-        normalized_levenshtein(str(v1), str(v2))
-        for v1 in vals1 for v2 in vals2
-    ]
-    return min(dists) if dists else 0.0
-
-def compute_matrix(ids: List[str], values_dict: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
-    """
-    Compute normalized Levenshtein distance between all pairs in ids, using values_dict.
-    Returns: dict[id][id] = min normalized distance.
-    """
-    matrix = {id1: {} for id1 in ids}
-    for idx1, id1 in enumerate(ids):
-        vals1 = values_dict.get(id1, [])
-        vals1 = vals1 if isinstance(vals1, list) else [vals1]
-        matrix[id1][id1] = 0.0
-        for idx2 in range(idx1 + 1, len(ids)):
-            id2 = ids[idx2]
-            vals2 = values_dict.get(id2, [])
-            vals2 = vals2 if isinstance(vals2, list) else [vals2]
-            dist = min_normalized_levenshtein(vals1, vals2)
-            matrix[id1][id2] = dist
-            matrix[id2][id1] = dist
-    return matrix
+from array import array
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+
+import knn
+from metrics import enable_fast_levenshtein, prepare_field, resolve_metric
+
+# At or above this many cases SETUP_MODE=auto stores sparse kNN instead of dense matrices.
+# Dense JSON costs ~30 bytes per pair: output.json is ~66 MB at 1,500 cases and
+# passes GitHub's 100 MB per-file push limit at ~1,800, so larger suites cannot
+# commit it (a 50k-case matrix would be ~75 GB).
+KNN_MIN_CASES = 1_500
+# Below this many cases a process pool costs more to start than it saves.
+PARALLEL_MIN_CASES = 200
+# Blocks handed out per worker; more blocks smooth out uneven row costs.
+BLOCKS_PER_WORKER = 4
+# Rows formatted per write task (or per write in the serial path).
+WRITE_ROWS = 64
+
+def condensed_index(n: int, i: int, j: int) -> int:
+    """Offset of pair (i, j), i < j, in a row-major condensed upper triangle."""
+    return i * n - i * (i + 1) // 2 + (j - i - 1)
+
+def row_blocks(n: int, num_blocks: int) -> List[Tuple[int, int]]:
+    """
+    Split rows [0, n) into contiguous blocks holding roughly equal numbers of
+    upper-triangle pairs. Row i owns pairs (i, j) for j > i, so early rows are
+    wide and late rows are narrow; equal row counts would leave workers idle.
+    """
+    total = n * (n - 1) // 2
+    if n == 0:
+        return []
+    if total == 0 or num_blocks <= 1:
+        return [(0, n)]
+    target = total / num_blocks
+    blocks, start, acc = [], 0, 0
+    for i in range(n):
+        acc += n - 1 - i
+        if acc >= target and i + 1 < n:
+            blocks.append((start, i + 1))
+            start, acc = i + 1, 0
+    if start < n:
+        blocks.append((start, n))
+    return blocks
+
+def fill_block(buf, field, start: int, end: int) -> None:
+    """Write distances for rows [start, end) of a prepared field into a condensed float64 buffer."""
+    n = len(field)
+    for i in range(start, min(end, n - 1)):
+        offset = condensed_index(n, i, i + 1)
+        buf[offset:offset + n - 1 - i] = field.row(i)
+
+def row_prefixes(ids: List[str]) -> List[str]:
+    """Text json.dump(indent=2) puts before each entry of a matrix row, per id."""
+    return ["\n    " + json.dumps(tid) + ": " for tid in ids]
+
+class FloatReprs(dict):
+    """
+    float -> repr(float), the text json.dump writes. Normalized Levenshtein
+    distances take few distinct values, and repr dominates writing, so it is
+    memoized; the cache is dropped whenever it outgrows maxsize.
+    """
+
+    def __init__(self, maxsize: int = 65536):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __missing__(self, value: float) -> str:
+        if len(self) >= self.maxsize:
+            self.clear()
+        text = self[value] = float.__repr__(value)
+        return text
+
+_FLOAT_REPRS = FloatReprs()
+
+def format_rows(ids: List[str], prefixes: List[str], buf, start: int, end: int) -> str:
+    """
+    JSON text of rows [start, end) of the dict[id][id] matrix, laid out exactly
+    as json.dump(indent=2) would write them, read straight from a condensed buffer.
+    """
+    reprs = _FLOAT_REPRS.__getitem__
+    n = len(ids)
+    parts = []
+    for i in range(start, end):
+        # Column i above the diagonal: offsets of (j, i) for j < i step by n - j - 2.
+        values, offset = [], i - 1
+        for j in range(i):
+            values.append(buf[offset])
+            offset += n - j - 2
+        values.append(0.0)
+        offset = condensed_index(n, i, i + 1)
+        values.extend(buf[offset:offset + n - 1 - i].tolist())
+        entries = ",".join(map(str.__add__, prefixes, map(reprs, values)))
+        parts.append(("," if i else "") + "\n  " + json.dumps(ids[i]) + ": {" + entries + "\n  }")
+    return "".join(parts)
+
+# Per-worker copy of the prepared fields, keyed by matrix name, and the suite ids.
+_WORKER_FIELDS: Dict[str, Any] = {}
+_WORKER_IDS: List[str] = []
+_WORKER_PREFIXES: List[str] = []
+
+def _init_worker(fields: Dict[str, Any], ids: List[str]):
+    global _WORKER_FIELDS, _WORKER_IDS, _WORKER_PREFIXES
+    _WORKER_FIELDS = fields
+    _WORKER_IDS = ids
+    _WORKER_PREFIXES = row_prefixes(ids)
+    # Pools only run for large suites, where rapidfuzz pays for its import.
+    enable_fast_levenshtein()
+
+def _compute_block(key: str, shm_name: str, start: int, end: int) -> Tuple[str, int, int]:
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buf = shm.buf.cast("d")
+        try:
+            fill_block(buf, _WORKER_FIELDS[key], start, end)
+        finally:
+            buf.release()
+    finally:
+        shm.close()
+    return key, start, end
+
+def _format_block(shm_name: str, start: int, end: int) -> bytes:
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buf = shm.buf.cast("d")
+        try:
+            return format_rows(_WORKER_IDS, _WORKER_PREFIXES, buf, start, end).encode("ascii")
+        finally:
+            buf.release()
+    finally:
+        shm.close()
+
+def resolve_workers(n: int, workers: Optional[int] = None) -> int:
+    """Worker count from the argument, SETUP_WORKERS, or the CPU count; 1 for small suites."""
+    if workers is None:
+        env = os.environ.get("SETUP_WORKERS", "").strip()
+        if env:
+            workers = int(env)
+        elif n < PARALLEL_MIN_CASES:
+            workers = 1
+        else:
+            workers = os.cpu_count() or 1
+    return max(1, workers)
+
+def matrix_row(ids: List[str], buf, i: int) -> Dict[str, float]:
+    n = len(ids)
+    row = {}
+    for j, id2 in enumerate(ids):
+        if j == i:
+            row[id2] = 0.0
+        elif j < i:
+            row[id2] = buf[condensed_index(n, j, i)]
+        else:
+            row[id2] = buf[condensed_index(n, i, j)]
+    return row
+
+def compute_matrix(ids: List[str], values_dict: Dict[str, Any], workers: Optional[int] = None, metric: str = "levenshtein") -> Dict[str, Dict[str, float]]:
+    """
+    Compute the metric's distance (normalized Levenshtein by default) between all pairs in ids, using values_dict.
+    Returns: dict[id][id] = min distance over value combinations.
+    """
+    buf = build_matrices(ids, {"matrix": prepare_field(metric, ids, values_dict)}, {}, workers, keep=True)["matrix"]
+    return {id1: matrix_row(ids, buf, i) for i, id1 in enumerate(ids)}
+
+def write_matrix(path: str, ids: List[str], buf) -> None:
+    """
+    Stream a condensed buffer to path as the dict[id][id] JSON that json.dump(indent=2)
+    would produce, a few rows at a time so the full dict-of-dicts is never built.
+    """
+    prefixes = row_prefixes(ids)
+    with open(path, "w") as f:
+        f.write("{")
+        for start in range(0, len(ids), WRITE_ROWS):
+            f.write(format_rows(ids, prefixes, buf, start, min(start + WRITE_ROWS, len(ids))))
+        f.write("\n}" if ids else "}")
+
+def write_matrix_pooled(pool, path: str, n: int, shm_name: str, window: int) -> None:
+    """
+    write_matrix for a condensed buffer in shared memory, with the rows formatted
+    by the pool's workers (initialized with the suite ids).
+    """
+    # Every row costs the same to format, so equal row counts balance. A bounded
+    # window of blocks in flight keeps the parent from holding the whole text.
+    with open(path, "wb") as f:
+        f.write(b"{")
+        pending = deque()
+        for start in range(0, n, WRITE_ROWS):
+            if len(pending) >= window:
+                f.write(pending.popleft().result())
+            pending.append(pool.submit(_format_block, shm_name, start, min(start + WRITE_ROWS, n)))
+        while pending:
+            f.write(pending.popleft().result())
+        f.write(b"\n}" if n else b"}")
+
+def build_matrices(ids: List[str], fields: Dict[str, Any], paths: Dict[str, str], workers: Optional[int] = None,
+                   keep: bool = False) -> Optional[Dict[str, array]]:
+    """
+    Compute condensed upper-triangle distance buffers for several fields at once
+    and write each to paths[key] (fields without a path are not written).
+    fields maps a matrix name (e.g. "input", "output") to a prepared field from
+    metrics.prepare_field, aligned to ids.
+    Row blocks of every matrix share one process pool, so the matrices are
+    computed concurrently. Each pair is computed by exactly one worker with the
+    same function as the serial path, so results do not depend on worker count.
+    With a pool, the workers also format the rows straight from the shared-memory
+    buffers; the parent only appends their text in row order, and no buffer is
+    copied out of shared memory unless keep is set.
+    With keep, returns dict[name] = array('d') in condensed_index order.
+    """
+    kept = {} if keep else None
+    n = len(ids)
+    size = n * (n - 1) // 2
+    workers = resolve_workers(n, workers)
+
+    if workers == 1 or size == 0:
+        for key, field in fields.items():
+            buf = array("d", [0.0]) * size
+            with memoryview(buf) as view:
+                fill_block(view, field, 0, n)
+            if key in paths:
+                write_matrix(paths[key], ids, buf)
+            if keep:
+                kept[key] = buf
+            del buf
+        return kept
+
+    # Imported here: single-process runs (all small suites) never need them.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from multiprocessing import shared_memory
+
+    blocks = row_blocks(n, workers * BLOCKS_PER_WORKER)
+    segments = {key: shared_memory.SharedMemory(create=True, size=8 * size) for key in fields}
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fields, ids)) as pool:
+            futures = [
+                pool.submit(_compute_block, key, segments[key].name, start, end)
+                for start, end in blocks
+                for key in fields
+            ]
+            for future in as_completed(futures):
+                future.result()
+            for key, shm in segments.items():
+                if key in paths:
+                    write_matrix_pooled(pool, paths[key], n, shm.name, workers * BLOCKS_PER_WORKER)
+                if keep:
+                    kept[key] = array("d")
+                    kept[key].frombytes(shm.buf[:8 * size])
+        return kept
+    finally:
+        for shm in segments.values():
+            shm.close()
+            shm.unlink()
+
+def resolve_mode(n: int) -> str:
+    """SETUP_MODE: "dense", "knn", or "auto" (kNN from KNN_MIN_CASES cases up)."""
+    mode = os.environ.get("SETUP_MODE", "auto").strip().lower()
+    if mode == "auto":
+        return "knn" if n >= KNN_MIN_CASES else "dense"
+    if mode not in ("dense", "knn"):
+        raise ValueError(f"Unknown SETUP_MODE: {mode!r}")
+    return mode
+
+def remove_stale(path: str):
+    """Drop a store left over from the other mode so prioritize.py never reads stale data."""
+    if os.path.isfile(path):
+        os.remove(path)
+        logging.info(f"Removed stale {path}")
 
 def check_test_script_exists(case: Dict[str, Any], scripts_dir: str, case_id: str) -> bool:
     """Checks if a script is defined in the test case or exists by convention in directory."""
@@ -77,7 +290,13 @@ def log_missing_scripts(test_cases: Dict[str, Any], scripts_dir: str) -> List[st
             missing.append(case_id)
     return missing
 
-def main():
+def main(test_cases: Optional[Dict[str, Any]] = None, keep: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Writes the distance matrices (or kNN stores) for test/test-cases.json, or for
+    test_cases when given. With keep, returns {"cases", "ids", "matrices"} where
+    matrices maps "input"/"output" to a condensed buffer or KnnGraph, so an
+    in-process caller (orchestrate.py) can prioritize without reading them back.
+    """
     test_case_file = os.path.join("test", "test-cases.json")
     string_distance_dir = os.path.join("test", "string-distances")
     input_matrix_file = os.path.join(string_distance_dir, "input.json")
@@ -91,31 +310,50 @@ def main():
 
     # Load test cases
     try:
-        with open(test_case_file, "r") as f:
-            test_cases = json.load(f)
+        if test_cases is None:
+            with open(test_case_file, "r") as f:
+                test_cases = json.load(f)
         if not isinstance(test_cases, dict) or not test_cases:
             logging.error("No test cases found. Exiting.")
-            return
+            return None
     except Exception as e:
         logging.error(f"Error loading {test_case_file}: {e}")
-        return
+        return None
 
     ids = list(test_cases.keys())
     input_values = {tid: test_cases[tid].get("input", "") for tid in ids}
     output_values = {tid: test_cases[tid].get("output", "") for tid in ids if "output" in test_cases[tid] and test_cases[tid]["output"] not in ("", None)}
     has_output = bool(output_values)
 
-    logging.info(f"Calculating input distance matrix for {len(ids)} cases...")
-    input_matrix = compute_matrix(ids, input_values)
-    with open(input_matrix_file, "w") as f:
-        json.dump(input_matrix, f, indent=2)
-
+    values = {"input": input_values}
     if has_output:
-        logging.info(f"Calculating output distance matrix for {len(ids)} cases...")
-        output_matrix = compute_matrix(ids, output_values)
-        with open(output_matrix_file, "w") as f:
-            json.dump(output_matrix, f, indent=2)
+        values["output"] = output_values
+    paths = {"input": input_matrix_file, "output": output_matrix_file}
+    try:
+        mode = resolve_mode(len(ids))
+        metrics = {key: resolve_metric(key) for key in values}
+        fields = {key: prepare_field(metrics[key], ids, values[key]) for key in values}
+    except ValueError as e:
+        logging.error(str(e))
+        return None
+    logging.info("Distance metrics: " + ", ".join(f"{key}={metric}" for key, metric in metrics.items()))
+
+    matrices: Dict[str, Any] = {}
+    if mode == "knn":
+        k = int(os.environ.get("KNN_K", str(knn.DEFAULT_K)))
+        for key, field in fields.items():
+            logging.info(f"Calculating {key} {k}-nearest-neighbour store for {len(ids)} cases...")
+            graph = knn.build_knn(ids, field, k=k)
+            graph.save(knn.knn_path(paths[key]))
+            remove_stale(paths[key])
+            matrices[key] = graph
     else:
+        workers = resolve_workers(len(ids))
+        logging.info(f"Calculating {' and '.join(fields)} distance matrices for {len(ids)} cases with {workers} worker(s)...")
+        matrices = build_matrices(ids, fields, {key: paths[key] for key in fields}, workers, keep=keep) or {}
+        for key in fields:
+            remove_stale(knn.knn_path(paths[key]))
+    if not has_output:
         logging.info("No valid outputs found. Skipping output distance matrix.")
 
     # Check for missing scripts
@@ -127,6 +365,7 @@ def main():
         logging.info("All test cases have corresponding scripts.")
 
     logging.info(f"Successfully created distance matrices for {len(ids)} cases.")
+    return {"cases": test_cases, "ids": ids, "matrices": matrices} if keep else None
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
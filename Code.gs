@@ -115,6 +115,11 @@ function doPost(e) {
         logMsg = "'test/string-distance/input.json' was changed. Triggering prioritize-cases workflow.";
         resultMsg = "OK - Prioritize Workflow Triggered";
         break;
+      case detectFile(update, 'test/string-distances/input-knn.json'):
+        workflow = 'prioritize-cases';
+        logMsg = "'test/string-distances/input-knn.json' was changed. Triggering prioritize-cases workflow.";
+        resultMsg = "OK - Prioritize Workflow Triggered";
+        break;
       default:
         getss(branch).appendRow([new Date(), "Other files changed. Exiting to avoid infinite loop.", JSON.stringify(update, null, 2)]);
         return ContentService.createTextOutput("OK - no workflow triggered.").setMimeType(ContentService.MimeType.TEXT);